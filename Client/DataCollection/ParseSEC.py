@@ -1,12 +1,12 @@
 import requests
-import bs4
 from enum import Enum
 import json
 import datetime
-from bs4 import BeautifulSoup
-import time
-import re
+import sqlite3
+import threading
+from typing import Iterable, Iterator, NamedTuple
 from dataManagement import DatabaseClient
+from edgarFetcher import EdgarFetcher
 
 
 class FormType(Enum):
@@ -16,24 +16,186 @@ class FormType(Enum):
     NO_FORM = 100
 
 
+# Name of each form type as written in the EDGAR indexes.
+FORM_TYPE_NAMES = {
+    FormType.TEN_K: "10-K",
+    FormType.TEN_Q: "10-Q",
+    FormType.EIGHT_K: "8-K",
+}
+
+
+class FormIndexEntry(NamedTuple):
+    """ One filing listed in a form.idx file. """
+    formType: str
+    companyName: str
+    cik: str
+    dateFiled: datetime.date
+    fileName: str
+
+
+# Column titles of a form.idx file, in order.
+_FORM_INDEX_COLUMNS = ("Form Type", "Company Name", "CIK", "Date Filed", "File Name")
+
+def parseFormIndex(lines: Iterable[str]) -> Iterator[FormIndexEntry]:
+    """ 
+        Lazily parses the lines of a form.idx file into entries. The offsets of the
+        fixed width columns are read from the header, then every field is sliced
+        straight out of its line.
+    """
+    lines = iter(lines)
+    offsets = None
+    for line in lines:
+        if line.startswith(_FORM_INDEX_COLUMNS[0]):
+            offsets = [line.index(title) for title in _FORM_INDEX_COLUMNS]
+        elif offsets is not None and line.startswith("---"):
+            break
+
+    if offsets is None:
+        raise ValueError("The form index does not have a header.")
+
+    _, company, cik, dateFiled, fileName = offsets
+    dateEnd = dateFiled + 10
+    toDate = datetime.date.fromisoformat
+    for line in lines:
+        if line.strip():
+            date = line[dateFiled:dateEnd].rstrip()
+            if len(date) == 8:
+                # The daily indexes write the dates as YYYYMMDD.
+                date = f"{date[:4]}-{date[4:6]}-{date[6:]}"
+
+            yield FormIndexEntry(line[:company].rstrip(),
+                                 line[company:cik].rstrip(),
+                                 line[cik:dateFiled].strip(),
+                                 toDate(date),
+                                 line[fileName:].strip())
+
+
+class FormIndexStore:
+    """
+    Local copy of the EDGAR form indexes in a SQLite file, indexed for lookups
+    by CIK, form type and filing date. Every index file is loaded once, the
+    names of the loaded files are kept in the store as well.
+    """
+    def __init__(self, path: str = "EdgarIndex.db"):
+        self.path = path
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        with self._connection:
+            self._connection.executescript("""
+                CREATE TABLE IF NOT EXISTS filings (
+                    fileName TEXT PRIMARY KEY,
+                    cik INTEGER NOT NULL,
+                    formType TEXT NOT NULL,
+                    dateFiled TEXT NOT NULL,
+                    companyName TEXT NOT NULL
+                );
+                CREATE INDEX IF NOT EXISTS filingsByCompany ON filings (cik, formType, dateFiled);
+                CREATE INDEX IF NOT EXISTS filingsByDate ON filings (dateFiled);
+                CREATE TABLE IF NOT EXISTS loadedIndexes (name TEXT PRIMARY KEY);
+            """)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def close(self):
+        self._connection.close()
+
+    def isLoaded(self, name: str) -> bool:
+        """ Returns whether the index file called name was loaded. """
+        with self._lock:
+            row = self._connection.execute("SELECT 1 FROM loadedIndexes WHERE name = ?", (name,)).fetchone()
+        return row is not None
+
+    def load(self, name: str, lines: Iterable[str]) -> int:
+        """ 
+            Adds the entries of a form.idx file, given by its lines, and marks it as
+            loaded in one transaction. Filings that are already stored are skipped.
+            Returns the number of filings added.
+        """
+        rows = ((entry.fileName, int(entry.cik), entry.formType, entry.dateFiled.isoformat(), entry.companyName)
+                for entry in parseFormIndex(lines))
+        with self._lock, self._connection:
+            before = self._connection.total_changes
+            self._connection.executemany("INSERT OR IGNORE INTO filings VALUES (?, ?, ?, ?, ?)", rows)
+            added = self._connection.total_changes - before
+            self._connection.execute("INSERT OR IGNORE INTO loadedIndexes VALUES (?)", (name,))
+        return added
+
+    def _select(self, conditions: list[str], params: list, form: FormType, startDate: datetime.date, endDate: datetime.date) -> list[FormIndexEntry]:
+        """ Returns the filings matching conditions, form and the range of dates, oldest first. """
+        if form is not None:
+            conditions.append("formType = ?")
+            params.append(FORM_TYPE_NAMES[form])
+        if startDate is not None:
+            conditions.append("dateFiled >= ?")
+            params.append(startDate.isoformat())
+        if endDate is not None:
+            conditions.append("dateFiled <= ?")
+            params.append(endDate.isoformat())
+
+        query = "SELECT formType, companyName, cik, dateFiled, fileName FROM filings"
+        if conditions:
+            query += " WHERE " + " AND ".join(conditions)
+        query += " ORDER BY dateFiled"
+
+        with self._lock:
+            rows = self._connection.execute(query, params).fetchall()
+        return [FormIndexEntry(formType, companyName, str(cik), datetime.date.fromisoformat(dateFiled), fileName)
+                for formType, companyName, cik, dateFiled, fileName in rows]
+
+    def filings(self, cik, form: FormType = None, startDate: datetime.date = None, endDate: datetime.date = None) -> list[FormIndexEntry]:
+        """ 
+            Returns the filings of a company, oldest first.
+            --------------------------------------------------
+            Params: 
+                cik: The CIK of the company.
+                form: Only return filings of this form type.
+                startDate, endDate: Only return filings filed in this range of dates, both included.
+        """
+        return self._select(["cik = ?"], [int(cik)], form, startDate, endDate)
+
+    def filingsByDate(self, startDate: datetime.date, endDate: datetime.date = None, form: FormType = None) -> list[FormIndexEntry]:
+        """ 
+            Returns the filings of every company filed from startDate to endDate, both
+            included, oldest first.
+            --------------------------------------------------
+            Params: 
+                startDate, endDate: The range of dates, endDate is unbounded when None.
+                form: Only return filings of this form type.
+        """
+        return self._select([], [], form, startDate, endDate)
+
+def _toDate(date: datetime.date) -> datetime.date:
+    """ Returns the date of a datetime, or date itself. """
+    return date.date() if isinstance(date, datetime.datetime) else date
+
+
 class SECParser:
     """ Default parser only parses data past 2015. """
     # Base archive url for the SEC EDGAR database.
+    SEC_ARCHIVES_URL = "https://www.sec.gov/Archives/"
     SEC_EDGAR_DATA_URL = "https://www.sec.gov/Archives/edgar/data/"
     SEC_EDGAR_DAILY_INDEX_URL = "https://www.sec.gov/Archives/edgar/daily-index/"
     SEC_EDGAR_FULL_INDEX_URL = "https://www.sec.gov/Archives/edgar/full-index/"
     TICKER_URL = "https://www.sec.gov/include/ticker.txt"
     
-    def __init__(self, databaseClient: DatabaseClient, startDate = datetime.datetime(2020, 1, 1), endDate = datetime.datetime.now()):
+    def __init__(self, databaseClient: DatabaseClient, startDate = datetime.datetime(2020, 1, 1), endDate = datetime.datetime.now(), formIndex: FormIndexStore = None,
+                 fetcher: EdgarFetcher = None):
         self.dBClient = databaseClient
         self.startDate = startDate
         self.endDate = endDate
+        self.formIndex = formIndex
+        self.fetcher = fetcher
     
     def updateCIKs(self):
         """ Writes the CIK numbers to a database client. """
         # Url for the CIK to ticker file.
-        response = requests.get(self.TICKER_URL)
-        self.dBClient.writeText("", response.text, "\t")
+        with requests.get(self.TICKER_URL, stream=True) as response:
+            response.encoding = response.encoding or "utf-8"
+            self.dBClient.writeLines("", response.iter_lines(decode_unicode=True), "\t")
 
     def yearQuarter(self, date: datetime.date) -> str:
         """ 
@@ -62,93 +224,107 @@ class SECParser:
 
         return year_quarter
 
-    def parseLine(self, line: str) -> list:
-        # TODO: Get 4th element for list. edgar/data/894871/0001493152-21-000653.txt
-        values = []
-        i = 0
-        while i < len(line) - 2:
-            if line[i] == " " and (line[i + 1].isalpha() or line[i + 1].isdigit()):
-                item = ""
-                i += 1
-                while i < len(line) - 3:
-                    item += line[i]
-                    if line[i] == " " and line[i + 1]  == " ":
-                        i += 1
-                        break
-                    
-                    i += 1
-
-                values.append(item)
-            i += 1
-
-        return values
-
-    def getDocumentByCompany(self, tickerSymbol: str): # form: FormType,
+    def quarters(self) -> list[str]:
+        """ Returns the quarters from startDate to endDate in the format of yearQuarter. """
+        start = _toDate(self.startDate)
+        end = _toDate(self.endDate)
+        quarters = []
+        year, month = start.year, 3 * ((start.month - 1) // 3) + 1
+        while datetime.date(year, month, 1) <= end:
+            quarters.append(self.yearQuarter(datetime.date(year, month, 1)))
+            year, month = (year + 1, 1) if month == 10 else (year, month + 3)
+        return quarters
+
+    def updateFormIndex(self):
         """ 
-            Returns a parsed document of relevant information by accessing
-            from.idx sorted documents via a GET request. 
+            Brings formIndex up to date for the quarters from startDate to endDate.
+            A quarter that has ended is loaded from its full form.idx once. The
+            current quarter is kept up to date from the daily indexes, only the
+            daily files that were not loaded before are downloaded.
+        """
+        if self.formIndex is None:
+            raise ValueError("The parser does not have a form index.")
+
+        currentQuarter = self.yearQuarter(datetime.date.today())
+        for quarter in self.quarters():
+            if self.formIndex.isLoaded(quarter):
+                continue
+
+            if quarter != currentQuarter:
+                self.formIndex.load(quarter, self._streamLines(self.SEC_EDGAR_FULL_INDEX_URL + quarter + "form.idx"))
+            else:
+                for fileName in self._dailyIndexNames(quarter):
+                    if not self.formIndex.isLoaded(quarter + fileName):
+                        self.formIndex.load(quarter + fileName, self._streamLines(self.SEC_EDGAR_DAILY_INDEX_URL + quarter + fileName))
+
+    def _dailyIndexNames(self, quarter: str) -> list[str]:
+        """ Returns the names of the daily form indexes of a quarter. """
+        try:
+            directory = json.loads(self._get(self.SEC_EDGAR_DAILY_INDEX_URL + quarter + "index.json"))
+        except requests.HTTPError as error:
+            # The directory of a quarter is only created on its first filing day.
+            if error.response is not None and error.response.status_code == 404:
+                return []
+            raise
+
+        names = [item["name"] for item in directory["directory"]["item"]]
+        return sorted(name for name in names if name.startswith("form.") and name.endswith(".idx"))
+
+    def _get(self, url: str) -> bytes:
+        """ Returns the content of url, through the fetcher when there is one. """
+        if self.fetcher is not None:
+            return self.fetcher.get(url)
+
+        with requests.get(url) as response:
+            response.raise_for_status()
+            return response.content
+
+    def _streamLines(self, url: str) -> Iterator[str]:
+        """ Yields the lines of a text file as it is downloaded, or from the fetcher's cache. """
+        if self.fetcher is not None:
+            yield from self.fetcher.get(url).decode("latin-1").splitlines()
+            return
+
+        with requests.get(url, stream=True) as response:
+            response.raise_for_status()
+            response.encoding = response.encoding or "latin-1"
+            yield from response.iter_lines(decode_unicode=True)
+
+    def getDocumentByCompany(self, tickerSymbol: str, form: FormType = FormType.TEN_K) -> list[FormIndexEntry]:
+        """ 
+            Returns the form index entries for the filings of one company and form type.
+            With a formIndex the filings from startDate to endDate are looked up locally,
+            otherwise the current quarter's form.idx is streamed and parsed line by line.
             --------------------------------------------------
             Params: 
-                form: The form type to be returned.
                 tickerSymbol: The ticker symbol for a stock. 
+                form: The form type to be returned.
         """
-        # Get the URL for the request.
-        # CIK = self.dBClient.getCIK(tickerSymbol)
-        #directoryURL = self.SEC_EDGAR_DATA_URL + CIK + 'index.json'
+        CIK = self.dBClient.getCIK(tickerSymbol)
+        if CIK is None:
+            return []
+
+        if self.formIndex is not None:
+            return self.formIndex.filings(CIK, form, _toDate(self.startDate), _toDate(self.endDate))
 
         # Create the URL for the current fiscal quarter.
         today = datetime.date.today()
         curr_year_quarter = self.yearQuarter(today)        
         directoryURL = self.SEC_EDGAR_FULL_INDEX_URL + curr_year_quarter + "form.idx"
 
-        # Separate response by line.
-        response = requests.get(directoryURL)
-        text = response.text
-        separated_lines = text.split("\n")
-
-        for line in separated_lines:
-            if line[0:5] == "10-K ":
-                print(line)
-                print(self.parseLine(line))
-                """
-                n = line.split("  ")
-                for space in n:
-                    if 
-                """
-        response.close()
-
-        # Get the index file for the accession numbers directory
-        # CIK specified format (Accession items) dict_keys(['item', 'name', 'parent-dir'])
-
+        formName = FORM_TYPE_NAMES[form]
+        entries = parseFormIndex(self._streamLines(directoryURL))
+        return [entry for entry in entries if entry.cik == CIK and entry.formType == formName]
 
+    def getFilings(self, entries: Iterable[FormIndexEntry]) -> dict:
+        """ 
+            Downloads the filings of form index entries concurrently through the fetcher.
+            Returns a dictionary of entry to the content of its file, or to the exception
+            raised while downloading it.
         """
-        for item in directoryIndex:
-            accessionNumber = item['name']
-            submissionLastChange = datetime.datetime.strptime(item['last-modified'], "%Y-%m-%d %H:%M:%S")
-            if  submissionLastChange >= self.startDate:
-                accessionURL = companyURL + item["name"] + '/'
-                submissionIndex = accessionURL + 'index.json'
-                response = requests.get(submissionIndex)
-                submissionFiles = response.json()["directory"]["item"]
-                response.close()
-
-                for file in submissionFiles:
-                    headerFileURL = None
-                    if file["name"][-18:] == "index-headers.html":
-                        headerFileURL = accessionURL + file["name"]
-
-                    if headerFileURL != None:
-                        response = requests.get(headerFileURL)
-                        soup = BeautifulSoup(response.content, "html.parser")
-                        text = soup.get_text()
-                        typed = re.compile(r"<TYPE>.+")
-                        formT = typed.findall(text)[0][6:]
-                            
-                        print(formT, headerFileURL)
-                
-            else:
-                break
+        if self.fetcher is None:
+            raise ValueError("The parser does not have a fetcher.")
 
-            time.sleep(0.5)
-        """
-    
\ No newline at end of file
+        entries = list(entries)
+        contents = self.fetcher.getMany([self.SEC_ARCHIVES_URL + entry.fileName for entry in entries])
+        return {entry: contents[self.SEC_ARCHIVES_URL + entry.fileName] for entry in entries}
@@ -4,10 +4,14 @@ Yahoo and stores the requested values using
 MongoDB.
 """
 import requests
+from requests.adapters import HTTPAdapter
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from enum import Enum
+import numpy as np
 import datetime
 import dataManagement
 from dataManagement import DatabaseClient
+from rateLimiter import TokenBucket
 
 
 class Frequency(Enum):
@@ -17,15 +21,63 @@ class Frequency(Enum):
     MONTH = 2
 
 
+def missingDateRanges(storedDates: list[datetime.date], startDate: datetime.date, endDate: datetime.date, maxMissingDays: int = 2) -> list[tuple]:
+    """
+    Description: Returns the (start, end) date ranges, both inclusive, between startDate and endDate
+                 that are not covered by storedDates.
+
+    Params:
+        storedDates: Sorted dates that are already stored.
+        startDate: The starting date for the requested data time frame.
+        endDate: The end date for the requested data time frame.
+        maxMissingDays: Number of weekdays that can be missing between two stored dates, or
+                        before the first stored date, before they count as a gap, so market
+                        holidays are not downloaded again.
+    """
+    storedDates = [date for date in storedDates if startDate <= date <= endDate]
+    if not storedDates:
+        ranges = [(startDate, endDate)]
+    else:
+        day = datetime.timedelta(days=1)
+        ranges = []
+        if np.busday_count(startDate, storedDates[0]) > maxMissingDays:
+            ranges.append((startDate, storedDates[0] - day))
+
+        # Gaps inside the stored dates that are longer than a holiday.
+        for previous, following in zip(storedDates, storedDates[1:]):
+            if np.busday_count(previous + day, following) > maxMissingDays:
+                ranges.append((previous + day, following - day))
+
+        ranges.append((storedDates[-1] + day, endDate))
+
+    # Ranges without a weekday have no quotes to download.
+    return [(start, end) for start, end in ranges if start <= end and np.busday_count(start, end + datetime.timedelta(days=1)) > 0]
+
+
 class DownloadHistoricalStock:
-    """ Only works as back as far January 2nd, 2015. """
+    """ 
+    Only works as back as far January 2nd, 2015.
+
+    Public members:
+        firstAvailableDates (dict): Ticker symbol to the first date Yahoo has quotes for, recorded
+                                    by sync when a download before the first stored date returned
+                                    nothing, so it is not requested again. Pass the dictionary of
+                                    an earlier run to keep it between runs.
+    """
     DAY_FACTOR = 86400.0
     START_DATE_INT = 1420156800 # Jan 2, 2015
     START_DATE_OBJECT = datetime.date(2015, 1, 2) 
 
-    def __init__(self, databaseClient: DatabaseClient):
+    def __init__(self, databaseClient: DatabaseClient, firstAvailableDates: dict = None, maxConnections: int = 8):
         self.url = "https://query1.finance.yahoo.com/v7/finance/download/{symbol}?period1={p1}&period2={p2}&interval=1d&events=history"
         self.dBClient = databaseClient
+        self.firstAvailableDates = {} if firstAvailableDates is None else firstAvailableDates
+
+        # Keep-alive connections are reused between downloads, up to maxConnections at once.
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=maxConnections)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
 
     def __dayToInt(self, date: datetime.date) -> int:
         """ Converts the date to the integer representation for url parameter. """
@@ -33,15 +85,16 @@ class DownloadHistoricalStock:
         dayInt = self.START_DATE_INT + (difference.days * self.DAY_FACTOR)
         return int(dayInt)
 
-    def download(self, tickerSymbol: str, startDate: datetime.date, endDate: datetime.date):
+    def download(self, tickerSymbol: str, startDate: datetime.date, endDate: datetime.date, rateLimiter: TokenBucket = None) -> int:
         """
         Description: Writes the values found on the Yahoo finance website for the historical stock prices for a 
-                     stock specified by tickerSymbol.
+                     stock specified by tickerSymbol. Returns the number of quotes received.
 
         Params:
             tickerSymbol:  The ticker symbol of a publicly traded company. (ex: "MSFT", "GOOG", "AMZN", etc.) 
             startDate:  The starting date for the requested data time frame. 
             endDate:  The end date for the requested data time frame.
+            rateLimiter:  Limiter to take a token from before the request is sent.
 
         Errors:
             ValueError: Raises a ValueError if endDate occurs before startDate.
@@ -58,7 +111,87 @@ class DownloadHistoricalStock:
         period2 = self.__dayToInt(endDate)
         url = self.url.format(symbol = tickerSymbol, p1 = period1, p2=period2)
         
-        # Writes an entry to a database given a stock quote.
-        with requests.get(url) as response:
+        if rateLimiter is not None:
+            rateLimiter.acquire()
+
+        # Streams the entries to the database as the response arrives.
+        received = 0
+        with self.session.get(url, stream=True) as response:
             response.raise_for_status()
-            self.dBClient.writeText(tickerSymbol, response.text, ",")
+            response.encoding = response.encoding or "utf-8"
+
+            def lines():
+                nonlocal received
+                for line in response.iter_lines(decode_unicode=True):
+                    if line:
+                        received += 1
+                        yield line
+
+            self.dBClient.writeLines(tickerSymbol, lines(), ",")
+
+        # The first line is the header.
+        return max(0, received - 1)
+
+    def sync(self, tickerSymbol: str, startDate: datetime.date, endDate: datetime.date, rateLimiter: TokenBucket = None) -> list[tuple]:
+        """
+        Description: Downloads only the stock quotes between startDate and endDate that the database
+                     client does not hold yet. Returns the date ranges that were downloaded. A client
+                     that does not accept backdated quotes only gets the dates after its last stored date.
+
+        Params:
+            tickerSymbol:  The ticker symbol of a publicly traded company. (ex: "MSFT", "GOOG", "AMZN", etc.) 
+            startDate:  The starting date for the requested data time frame. 
+            endDate:  The end date for the requested data time frame (inclusive).
+            rateLimiter:  Limiter to take a token from before each request is sent.
+        """
+        if startDate > endDate:
+            raise ValueError("Variable startDate must be before endDate.")
+
+        storedDates = self.dBClient.getStoredDates(tickerSymbol)
+        startDate = max(startDate, self.START_DATE_OBJECT, self.firstAvailableDates.get(tickerSymbol.upper(), startDate))
+        if storedDates and not self.dBClient.acceptsBackdatedQuotes:
+            # Older quotes would be dropped, so downloading them again never fills the gap.
+            startDate = max(startDate, storedDates[-1] + datetime.timedelta(days=1))
+            if startDate > endDate:
+                return []
+
+        ranges = missingDateRanges(storedDates, startDate, endDate)
+
+        # The end of a download period is exclusive, so request through the following day.
+        for start, end in ranges:
+            received = self.download(tickerSymbol, start, end + datetime.timedelta(days=1), rateLimiter)
+            if received == 0 and storedDates and end < storedDates[0]:
+                # The stock was listed later, so there is nothing before its first stored date.
+                self.firstAvailableDates[tickerSymbol.upper()] = storedDates[0]
+
+        return ranges
+
+    def downloadMany(self, tickerSymbols: list[str], startDate: datetime.date, endDate: datetime.date,
+                     maxWorkers: int = 8, requestsPerSecond: float = 2.0, onlyMissing: bool = False) -> dict:
+        """
+        Description: Downloads the historical stock prices of several stocks at once. Each download
+                     is streamed into the database client as it arrives, so the client must accept
+                     writes from several threads.
+
+        Params:
+            tickerSymbols:  The ticker symbols of publicly traded companies.
+            startDate:  The starting date for the requested data time frame. 
+            endDate:  The end date for the requested data time frame.
+            maxWorkers:  Largest number of downloads that run at the same time. Connections beyond
+                         the maxConnections of the downloader are not kept alive.
+            requestsPerSecond:  Largest number of requests started per second.
+            onlyMissing:  Download only the dates the database client does not hold, see sync.
+
+        Returns a dictionary of ticker symbol to None if the download succeeded, or to the
+        exception raised by the download if it failed.
+        """
+        # Each call has its own limiter, so overlapping calls do not change each other's rate.
+        rateLimiter = TokenBucket(requestsPerSecond)
+        method = self.sync if onlyMissing else self.download
+        results = {}
+        with ThreadPoolExecutor(max_workers=maxWorkers) as executor:
+            futures = {executor.submit(method, symbol, startDate, endDate, rateLimiter): symbol for symbol in dict.fromkeys(tickerSymbols)}
+            for future in as_completed(futures):
+                results[futures[future]] = future.exception()
+
+        return results
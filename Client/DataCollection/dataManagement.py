@@ -3,47 +3,246 @@ Different classes that are used to interface with different
 database providers. Other implementations must overwrite DatabaseClient
 methods.
 
-Usable Clients: MongoDB.
+Usable Clients: MongoDB, MemoryMappedStore, SQLite.
+WriteBehindClient wraps any of them to write in the background.
 """
-from pymongo import MongoClient
-from typing import IO
+from pymongo import MongoClient, UpdateOne
+from pymongo.errors import DuplicateKeyError
+from typing import IO, Iterable, Iterator
 from abc import ABC, abstractmethod
 from enum import Enum
+from itertools import islice
+from collections import deque
+import numpy as np
 import datetime
+import json
+import io
+import os
+import queue
+import sqlite3
+import threading
+import time
+
+
+def batched(iterable: Iterable, batchSize: int) -> Iterator[list]:
+    """ Yields lists of up to batchSize items from iterable. """
+    iterator = iter(iterable)
+    batch = list(islice(iterator, batchSize))
+    while batch:
+        yield batch
+        batch = list(islice(iterator, batchSize))
+
+
+# Stores that keep dates as integers count the days since EPOCH.
+EPOCH = datetime.date(1970, 1, 1)
+
+def dateToDays(date: datetime.date) -> int:
+    """ Converts a date into the number of days since EPOCH. """
+    if isinstance(date, datetime.datetime):
+        date = date.date()
+    return (date - EPOCH).days
+
+def daysToDate(days: int) -> datetime.date:
+    """ Converts a number of days since EPOCH, or a date from readPrices, into a date. """
+    if isinstance(days, np.datetime64):
+        days = days.astype("datetime64[D]").astype(np.int64)
+    return EPOCH + datetime.timedelta(days=int(days))
+
+
+# Fields of a daily stock quote and the type of their arrays returned by readPrices.
+PRICE_FIELDS = {
+    "Date": np.dtype("datetime64[D]"),
+    "Open": np.dtype(np.float64),
+    "High": np.dtype(np.float64),
+    "Low": np.dtype(np.float64),
+    "Close": np.dtype(np.float64),
+    "Adj Close": np.dtype(np.float64),
+    "Volume": np.dtype(np.int64),
+}
 
 
 class DataBaseClientType(Enum):
     """ Different database providers that are availalbe. """
     MONGODB = 0
+    MEMORY_MAPPED = 1
+    SQLITE = 2
+
+
+def createDatabaseClient(clientType: DataBaseClientType, **options) -> "DatabaseClient":
+    """ Returns a new database client of clientType, options are passed to its constructor. """
+    clients = {
+        DataBaseClientType.MONGODB: MongoDB,
+        DataBaseClientType.MEMORY_MAPPED: MemoryMappedStore,
+        DataBaseClientType.SQLITE: SQLite,
+    }
+    return clients[clientType](**options)
+
+
+# Shared MongoClients by client type, host and options, with the number of database
+# clients using each. The type is part of the key so a replaced MongoClient, such as
+# a test double, is never handed a client created before it.
+_mongoClients = {}
+_mongoClientKeys = {}
+_mongoClientsLock = threading.Lock()
+
+def acquireMongoClient(host: str = None, **options) -> MongoClient:
+    """ 
+        Returns the MongoClient of the process for host and options, creating it on
+        first use. Every call must be matched by a call to releaseMongoClient.
+    """
+    key = (MongoClient, host, tuple(sorted(options.items())))
+    with _mongoClientsLock:
+        entry = _mongoClients.get(key)
+        if entry is None:
+            entry = _mongoClients[key] = [MongoClient(host, **options), 0]
+            _mongoClientKeys[id(entry[0])] = key
+        entry[1] += 1
+        return entry[0]
+
+def releaseMongoClient(client: MongoClient):
+    """ Releases a client from acquireMongoClient, closing it when nothing else uses it. """
+    with _mongoClientsLock:
+        key = _mongoClientKeys.get(id(client))
+        if key is None:
+            return
+
+        entry = _mongoClients[key]
+        entry[1] -= 1
+        if entry[1] > 0:
+            return
+
+        del _mongoClients[key]
+        del _mongoClientKeys[id(client)]
+    client.close()
 
 
 class DatabaseClient(ABC):
     """ 
     An abstract base class that defines the methods all database clients should provide for
-    data access and writing.
+    data access and writing. Clients can be used as context managers, which closes them
+    on exit.
+
+    Public members:
+        acceptsBackdatedQuotes (bool): Whether quotes older than the last stored date of a
+                                       stock are written, rather than skipped.
     """
+    acceptsBackdatedQuotes = True
+
+    def open(self):
+        """ Acquires the connections of the client, clients are opened when they are created. """
+        pass
+
+    def close(self):
+        """ Releases the connections of the client. It can be opened again with open. """
+        pass
+
+    def __enter__(self):
+        self.open()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
     @abstractmethod
     def getCIK(self, tickerSymbol: str) -> str:
         raise NotImplementedError("Implement method.")
+
+    def getCIKs(self, tickerSymbols: Iterable[str]) -> dict:
+        """ Returns a dictionary of ticker symbol to CIK number, None for unknown symbols. """
+        return {symbol: self.getCIK(symbol) for symbol in tickerSymbols}
+
+    @abstractmethod
+    def getStoredDates(self, tickerSymbol: str) -> list[datetime.date]:
+        """ Returns the sorted dates of the stock quotes stored for a ticker symbol. """
+        raise NotImplementedError("Implement method.")
     
     @abstractmethod
-    def _writeStockQuote(self, tickerSymbol: str, separatedLines: list[str], separator: str):
+    def _readPrices(self, tickerSymbol: str, startDate: datetime.date, endDate: datetime.date, fields: list[str]) -> dict:
+        """ Returns a dictionary of field to the array of its values for one stock, see readPrices. """
+        raise NotImplementedError("Implement method.")
+
+    def readPrices(self, tickerSymbols, startDate: datetime.date = None, endDate: datetime.date = None, fields: Iterable[str] = None) -> dict:
+        """ 
+            Returns the stored quotes from startDate to endDate, both included, as a
+            dictionary of field to a NumPy array of its values in date order. Dates
+            are datetime64[D], the other fields have the types in PRICE_FIELDS.
+            --------------------------------------------------
+            Params: 
+                tickerSymbols: A ticker symbol, or a list of them to get a dictionary
+                               of ticker symbol to the fields of each stock.
+                startDate, endDate: The range of dates, unbounded when None.
+                fields: The fields to return, all of PRICE_FIELDS when None, must not be empty.
+        """
+        fields = list(PRICE_FIELDS) if fields is None else list(fields)
+        if not fields:
+            raise ValueError("Request at least one price field.")
+        for field in fields:
+            if field not in PRICE_FIELDS:
+                raise ValueError(f"Unknown price field: {field}")
+
+        if isinstance(tickerSymbols, str):
+            return self._readPrices(tickerSymbols, startDate, endDate, fields)
+        return {symbol: self._readPrices(symbol, startDate, endDate, fields) for symbol in tickerSymbols}
+
+    def _writeStockQuote(self, tickerSymbol: str, separatedLines: Iterable[str], separator: str):
         """ 
             Helper function to write a stock quote to a DatabaseClient.
+            separatedLines may be a lazy iterator, the first line holds the
+            data titles.
         """
-        raise NotImplementedError("Implement method.")
+        self._writeQuoteEntries(tickerSymbol, self._parseStockQuotes(separatedLines, separator))
 
-    @abstractmethod
-    def _writeCIK(self, separatedLines: list[str], separator: str):
+    def _writeCIK(self, separatedLines: Iterable[str], separator: str):
         """ 
             Helper function to write the CIK numbers for a publicly traded
             company to find their SEC filings to a DatabaseClient. 
         """
+        self._writeCIKEntries(self._parseCIKs(separatedLines, separator))
+
+    @abstractmethod
+    def _writeQuoteEntries(self, tickerSymbol: str, entries: Iterable[dict]):
+        """ Writes parsed stock quote entries, entries may be a lazy iterator. """
+        raise NotImplementedError("Implement method.")
+
+    @abstractmethod
+    def _writeCIKEntries(self, entries: Iterable[dict]):
+        """ Replaces the stored ticker symbol to CIK table with parsed entries. """
         raise NotImplementedError("Implement method.")
 
     def parseDate(self, date: str) -> datetime.date:
         return datetime.datetime.strptime(date, "%Y-%m-%d")
 
+    def _parseStockQuote(self, headers: list[str], values: list[str]) -> dict:
+        """ Converts the values of one stock quote line into a database entry. """
+        return {
+            headers[0]: self.parseDate(values[0]),
+            headers[1]: float(values[1]),
+            headers[2]: float(values[2]),
+            headers[3]: float(values[3]),
+            headers[4]: float(values[4]),
+            headers[5]: float(values[5]),
+            headers[6]: int(values[6])
+        }
+
+    def _parseStockQuotes(self, separatedLines: Iterable[str], separator: str) -> Iterator[dict]:
+        """ Lazily parses stock quote lines into entries. The first line holds the data titles. """
+        lines = iter(separatedLines)
+        headers = next(lines, "").split(separator)
+
+        for line in lines:
+            if line:
+                yield self._parseStockQuote(headers, line.split(separator))
+
+    def _parseCIKs(self, separatedLines: Iterable[str], separator: str) -> Iterator[dict]:
+        """ Lazily parses ticker symbol and CIK number lines into entries. """
+        for line in separatedLines:
+            if line:
+                values = line.split(separator)
+                yield {
+                    "Symbol": str(values[0]).upper(),
+                    "CIK": int(values[1])
+                }
+
     def writeText(self, tickerSymbol: str, text: str, sep: str):
         """  
             Writes a stock quote to a database based on a separatorType.
@@ -58,14 +257,33 @@ class DatabaseClient(ABC):
                 sep: Separator the text file is deliminated by. Same meaning 
                      and use as in the str.split() method.
         """
+        self.writeLines(tickerSymbol, io.StringIO(text), sep)
+
+    def writeLines(self, tickerSymbol: str, lines: Iterable[str], sep: str):
+        """  
+            Writes a stock quote to a database based on a separatorType from an
+            iterable of lines, such as the iter_lines() of a streamed response.
+            The lines are consumed lazily, so only the batch being written is
+            held in memory.
+            
+            ----------------------------------------------------------------------
+            params:
+                tickerSymbol: Ticker symbol that represents the specified publicly
+                              traded companies.
+                
+                lines: The lines that are being parsed, with or without line endings.
+
+                sep: Separator the lines are deliminated by. Same meaning 
+                     and use as in the str.split() method.
+        """
         separators = [",", "\t"]
 
         if sep in separators:
-            self.__writeDeliminatedEntry(tickerSymbol, text, sep)
+            self.__writeDeliminatedEntry(tickerSymbol, (line.rstrip("\r\n") for line in lines), sep)
         else:
             print("Error writing to database.")
 
-    def __writeDeliminatedEntry(self, tickerSymbol: str, text: str, separator: str):
+    def __writeDeliminatedEntry(self, tickerSymbol: str, separatedLines: Iterable[str], separator: str):
         """
             Writes an entry to the Stocks database. Format is specified
             by other helper functtion.
@@ -73,12 +291,9 @@ class DatabaseClient(ABC):
             Params:
                 tickerSymbol: Ticker symbol that represents the specified publicly
                               traded companies.
-                text: The text that is being parsed.
+                separatedLines: The lines that are being parsed.
 
         """
-        # Separate the lines from the file.
-        separatedLines = text.split(sep='\n')
-
         if separator == ",":
             self._writeStockQuote(tickerSymbol, separatedLines, separator)
         elif separator == "\t":
@@ -86,14 +301,104 @@ class DatabaseClient(ABC):
 
 
 class MongoDB(DatabaseClient):
-    """ MongoDB database client implementation. """
-    def __init__(self):
-        self.client = MongoClient()
-        self.StocksDB = self.client["Stocks"]
+    """ 
+        MongoDB database client implementation. Writes are sent in unordered
+        bulk operations of up to batchSize documents.
+
+        Clients with the same host and connection options share one MongoClient,
+        and with it one connection pool, for the whole process.
+
+        By default every stock has its own collection with a unique index on Date.
+        With timeSeries, the quotes of all stocks are kept in the Quotes time series
+        collection instead, with the ticker symbol as its metaField and an index on
+        Symbol and Date. Time series collections need MongoDB 5.0, older servers
+        keep using a collection per stock.
+        --------------------------------------------------
+        Params:
+            host: The MongoDB host or connection string, localhost when None.
+            maxPoolSize: The largest number of connections in the pool.
+            serverSelectionTimeoutMS, connectTimeoutMS, socketTimeoutMS: Timeouts in milliseconds.
+            writeConcern: Write concern options of MongoClient, such as {"w": "majority", "journal": True}.
+            timeSeries: Store the quotes in one time series collection.
+    """
+    QUOTES_COLLECTION = "Quotes"
+
+    def __init__(self, batchSize: int = 1000, host: str = None, maxPoolSize: int = 100, serverSelectionTimeoutMS: int = 30000,
+                 connectTimeoutMS: int = 20000, socketTimeoutMS: int = None, writeConcern: dict = None, timeSeries: bool = False):
+        self.batchSize = batchSize
+        self.host = host
+        self.timeSeries = timeSeries
+        self.clientOptions = {
+            "maxPoolSize": maxPoolSize,
+            "serverSelectionTimeoutMS": serverSelectionTimeoutMS,
+            "connectTimeoutMS": connectTimeoutMS,
+            "socketTimeoutMS": socketTimeoutMS,
+            **(writeConcern or {}),
+        }
+        self.client = None
+
+        # Ticker symbol to CIK number, loaded from CIK_ID on the first lookup.
+        self._ciks = None
+
+        # Collections whose indexes were created by this client.
+        self._indexedCollections = set()
+        self.open()
+
+    def open(self):
+        if self.client is None:
+            self.client = acquireMongoClient(self.host, **self.clientOptions)
+            self.StocksDB = self.client["Stocks"]
+
+            if self.timeSeries and tuple(self.client.server_info()["versionArray"][:2]) < (5, 0):
+                self.timeSeries = False
+
+    def close(self):
+        if self.client is not None:
+            releaseMongoClient(self.client)
+            self.client = None
+            self.StocksDB = None
         
-    def _DatabaseClient__writeStockQuote(self, tickerSymbol: str, separatedLines: list[str], separator: str):
+    def _stockCollection(self, tickerSymbol: str, forWriting: bool = False):
+        """ 
+            Returns the collection with the quotes of a stock. Before the first write
+            the collection and its indexes are created, reads never create them.
         """
-            Sideaffect: Removes the first element from separatedLines.
+        name = self.QUOTES_COLLECTION if self.timeSeries else tickerSymbol.upper()
+        collection = self.StocksDB[name]
+        if not forWriting or name in self._indexedCollections:
+            return collection
+
+        if self.timeSeries:
+            if name not in self.StocksDB.list_collection_names(filter={"name": name}):
+                self.StocksDB.create_collection(name, timeseries={"timeField": "Date", "metaField": "Symbol", "granularity": "hours"})
+            collection.create_index([("Symbol", 1), ("Date", 1)])
+        else:
+            try:
+                collection.create_index("Date", unique=True)
+            except DuplicateKeyError:
+                # Quotes written before the index existed can be stored more than once.
+                self._removeDuplicateDates(collection)
+                collection.create_index("Date", unique=True)
+
+        self._indexedCollections.add(name)
+        return collection
+
+    def _removeDuplicateDates(self, collection):
+        """ Deletes all but the last inserted quote of every date that is stored more than once. """
+        duplicates = collection.aggregate([
+            {"$sort": {"_id": 1}},
+            {"$group": {"_id": "$Date", "ids": {"$push": "$_id"}, "count": {"$sum": 1}}},
+            {"$match": {"count": {"$gt": 1}}},
+        ])
+        for duplicate in duplicates:
+            collection.delete_many({"_id": {"$in": duplicate["ids"][:-1]}})
+
+    def _writeQuoteEntries(self, tickerSymbol: str, entries: Iterable[dict]):
+        """
+            Entries are upserted on their Date, so writing the same quotes
+            again replaces them instead of adding duplicates. Time series
+            collections do not support upserts, so there the quotes on dates
+            that are already stored are skipped instead.
 
             -----------------------------------------
             Entry format example:
@@ -108,54 +413,540 @@ class MongoDB(DatabaseClient):
             }
         """
         # Create or get the current collection.
-        stockCollection = self.StocksDB[tickerSymbol]
+        stockCollection = self._stockCollection(tickerSymbol, forWriting=True)
 
-        # Get the data titles and remove the first line from the list.
-        headers = separatedLines[0].split(separator)
-        separatedLines.pop(0)
+        if self.timeSeries:
+            symbol = tickerSymbol.upper()
+            for batch in batched(entries, self.batchSize):
+                dates = [entry["Date"] for entry in batch]
+                query = {"Symbol": symbol, "Date": {"$gte": min(dates), "$lte": max(dates)}}
+                stored = {document["Date"] for document in stockCollection.find(query, {"Date": 1, "_id": 0})}
+                documents = [{"Symbol": symbol, **entry} for entry in batch if entry["Date"] not in stored]
+                if documents:
+                    stockCollection.insert_many(documents, ordered=False)
+            return
 
-        # Create and insert an entry for each individual stock quote.
-        for line in separatedLines:
-            values = line.split(separator)
-
-            # Database entry
-            entry = {
-                headers[0]: self.parseDate(values[0]),
-                headers[1]: float(values[1]),
-                headers[2]: float(values[2]),
-                headers[3]: float(values[3]),
-                headers[4]: float(values[4]),
-                headers[5]: float(values[5]),
-                headers[6]: int(values[6])
-            }
-            stockCollection.insert_one(entry)
+        # Upsert an entry for each individual stock quote, one batch at a time.
+        for batch in batched(entries, self.batchSize):
+            operations = [UpdateOne({"Date": entry["Date"]}, {"$set": entry}, upsert=True) for entry in batch]
+            stockCollection.bulk_write(operations, ordered=False)
 
-    def _DatabaseClient__writeCIK(self, separatedLines: list[str], separator: str):
-        """ Values are hard coded becasue format should never change. """
+    def _writeCIKEntries(self, entries: Iterable[dict]):
+        """ 
+            Entries are upserted on their Symbol, which has a unique index, and
+            symbols that are no longer listed are removed afterwards. The CIK
+            numbers kept in memory are replaced by the new table.
+        """
         # Create or get the current collection.
-        self.StocksDB["CIK_ID"].drop()
         cik_collection = self.StocksDB["CIK_ID"]
-        
-        for line in separatedLines:
-            values = line.split(separator)
+        cik_collection.create_index("Symbol", unique=True)
 
-            # Database entry
-            entry = {
-                "Symbol": str(values[0]).upper(),
-                "CIK": int(values[1])
-            }
-            cik_collection.insert_one(entry)
+        ciks = {}
+        for batch in batched(entries, self.batchSize):
+            operations = [UpdateOne({"Symbol": entry["Symbol"]}, {"$set": entry}, upsert=True) for entry in batch]
+            cik_collection.bulk_write(operations, ordered=False)
+            ciks.update((entry["Symbol"], str(entry["CIK"])) for entry in batch)
+
+        cik_collection.delete_many({"Symbol": {"$nin": list(ciks)}})
+        self._ciks = ciks
+
+    def _loadCIKs(self) -> dict:
+        """ Returns the ticker symbol to CIK number table, reading it from CIK_ID once. """
+        if self._ciks is None:
+            cursor = self.StocksDB["CIK_ID"].find({}, {"Symbol": 1, "CIK": 1, "_id": 0})
+            self._ciks = {document["Symbol"]: str(document["CIK"]) for document in cursor}
+        return self._ciks
+
+    def getStoredDates(self, tickerSymbol: str) -> list[datetime.date]:
+        """ Only the Date field of each document is sent back, read from the Date index. """
+        if self.timeSeries:
+            query = {"Symbol": tickerSymbol.upper()}
+        else:
+            query = {}
+        cursor = self._stockCollection(tickerSymbol).find(query, {"Date": 1, "_id": 0}).sort("Date", 1)
+        return [document["Date"].date() for document in cursor]
 
     def getCIK(self, tickerSymbol: str) -> str:
         """ 
             Returns the string reperesentation of the CIK number
             for a companies ticker symbol.
         """
-        cik_collection = self.StocksDB["CIK_ID"]
-        document = cik_collection.find_one({"Symbol": tickerSymbol.upper()})
+        return self._loadCIKs().get(tickerSymbol.upper())
 
-        if document is None:
-            return None
-        else:
-            return str(document["CIK"])
-        
\ No newline at end of file
+    def getCIKs(self, tickerSymbols: Iterable[str]) -> dict:
+        ciks = self._loadCIKs()
+        return {symbol: ciks.get(symbol.upper()) for symbol in tickerSymbols}
+
+    def _readPrices(self, tickerSymbol: str, startDate: datetime.date, endDate: datetime.date, fields: list[str]) -> dict:
+        """ 
+            The range of dates is filtered on the server through the Date index and
+            only the requested fields are sent back, batchSize documents at a time.
+        """
+        query = {"Symbol": tickerSymbol.upper()} if self.timeSeries else {}
+        dates = {}
+        if startDate is not None:
+            dates["$gte"] = datetime.datetime.combine(startDate, datetime.time())
+        if endDate is not None:
+            dates["$lte"] = datetime.datetime.combine(endDate, datetime.time())
+        if dates:
+            query["Date"] = dates
+
+        projection = {field: 1 for field in fields}
+        projection.update({"Date": 1, "_id": 0})
+        cursor = self._stockCollection(tickerSymbol).find(query, projection, batch_size=self.batchSize).sort("Date", 1)
+        documents = list(cursor)
+
+        prices = {}
+        for field in fields:
+            if field == "Date":
+                values = np.array([document["Date"] for document in documents], dtype="datetime64[ms]")
+                prices[field] = values.astype(PRICE_FIELDS["Date"])
+            else:
+                prices[field] = np.fromiter((document[field] for document in documents), dtype=PRICE_FIELDS[field], count=len(documents))
+        return prices
+
+
+class MemoryMappedStore(DatabaseClient):
+    """ 
+        Local columnar store for daily stock quotes. Every symbol has a directory
+        with one fixed-width binary file per field, which is read back with
+        numpy.memmap so range reads do not copy or deserialize anything.
+
+        Dates are stored as the number of days since 1970-01-01 (int32). Files are
+        append only: quotes on or before the last stored date are skipped, so
+        downloading the same range again does not add duplicate rows.
+    """
+    acceptsBackdatedQuotes = False
+
+    # Field name, file name and type of every column.
+    COLUMNS = {
+        "Date": ("Date.i4", np.int32),
+        "Open": ("Open.f8", np.float64),
+        "High": ("High.f8", np.float64),
+        "Low": ("Low.f8", np.float64),
+        "Close": ("Close.f8", np.float64),
+        "Adj Close": ("AdjClose.f8", np.float64),
+        "Volume": ("Volume.i8", np.int64),
+    }
+
+    def __init__(self, directory: str = "StockData", batchSize: int = 1000):
+        self.directory = directory
+        self.batchSize = batchSize
+        os.makedirs(directory, exist_ok=True)
+
+        # Ticker symbol to CIK number, loaded from CIK_ID.json on the first lookup.
+        self._ciks = None
+
+    def _columnPath(self, tickerSymbol: str, field: str) -> str:
+        return os.path.join(self.directory, tickerSymbol.upper(), self.COLUMNS[field][0])
+
+    def _numberOfRows(self, tickerSymbol: str) -> int:
+        """ The Date column is written last, so its length is the number of complete rows. """
+        path = self._columnPath(tickerSymbol, "Date")
+        if not os.path.exists(path):
+            return 0
+        return os.path.getsize(path) // np.dtype(np.int32).itemsize
+
+    def _truncateColumns(self, tickerSymbol: str, numberOfRows: int):
+        """ 
+            Cuts every column back to numberOfRows values. A write that stopped part
+            way leaves values past the last complete row, which would otherwise put
+            every row appended after them out of line with its date.
+        """
+        for field, (_, dtype) in self.COLUMNS.items():
+            path = self._columnPath(tickerSymbol, field)
+            size = numberOfRows * np.dtype(dtype).itemsize
+            if os.path.exists(path) and os.path.getsize(path) > size:
+                with open(path, "r+b") as fp:
+                    fp.seek(size)
+                    fp.truncate()
+
+    def _column(self, tickerSymbol: str, field: str, numberOfRows: int) -> np.ndarray:
+        """ Returns a read only memory map of the first numberOfRows values of a column. """
+        dtype = self.COLUMNS[field][1]
+        if numberOfRows == 0:
+            return np.empty(0, dtype=dtype)
+        return np.memmap(self._columnPath(tickerSymbol, field), dtype=dtype, mode="r", shape=(numberOfRows,))
+
+    def getStoredDates(self, tickerSymbol: str) -> list[datetime.date]:
+        dates = self._column(tickerSymbol, "Date", self._numberOfRows(tickerSymbol))
+        return dates.astype("datetime64[D]").tolist()
+
+    def _writeQuoteEntries(self, tickerSymbol: str, entries: Iterable[dict]):
+        """ 
+            Appends the quotes that are newer than the last stored date. Older
+            quotes are skipped, the files are never rewritten.
+        """
+        os.makedirs(os.path.join(self.directory, tickerSymbol.upper()), exist_ok=True)
+
+        numberOfRows = self._numberOfRows(tickerSymbol)
+        self._truncateColumns(tickerSymbol, numberOfRows)
+        dates = self._column(tickerSymbol, "Date", numberOfRows)
+        lastDate = int(dates[-1]) if numberOfRows else np.iinfo(np.int32).min
+
+        for batch in batched(entries, self.batchSize):
+            batch = [entry for entry in batch if dateToDays(entry["Date"]) > lastDate]
+            if not batch:
+                continue
+
+            # Write the Date column last so readers never see a partially written row.
+            for field in list(self.COLUMNS)[1:] + ["Date"]:
+                if field == "Date":
+                    values = [dateToDays(entry["Date"]) for entry in batch]
+                else:
+                    values = [entry[field] for entry in batch]
+
+                with open(self._columnPath(tickerSymbol, field), "ab") as fp:
+                    fp.write(np.asarray(values, dtype=self.COLUMNS[field][1]).tobytes())
+
+            lastDate = dateToDays(batch[-1]["Date"])
+
+    def _writeCIKEntries(self, entries: Iterable[dict]):
+        """ Replaces the stored ticker symbol to CIK table. """
+        ciks = {entry["Symbol"]: entry["CIK"] for entry in entries}
+        with open(os.path.join(self.directory, "CIK_ID.json"), "w") as fp:
+            json.dump(ciks, fp)
+        self._ciks = {symbol: str(cik) for symbol, cik in ciks.items()}
+
+    def _loadCIKs(self) -> dict:
+        """ Returns the ticker symbol to CIK number table, reading CIK_ID.json once. """
+        if self._ciks is None:
+            path = os.path.join(self.directory, "CIK_ID.json")
+            if not os.path.exists(path):
+                return {}
+
+            with open(path) as fp:
+                self._ciks = {symbol: str(cik) for symbol, cik in json.load(fp).items()}
+        return self._ciks
+
+    def getCIK(self, tickerSymbol: str) -> str:
+        """ 
+            Returns the string reperesentation of the CIK number
+            for a companies ticker symbol.
+        """
+        return self._loadCIKs().get(tickerSymbol.upper())
+
+    def getCIKs(self, tickerSymbols: Iterable[str]) -> dict:
+        ciks = self._loadCIKs()
+        return {symbol: ciks.get(symbol.upper()) for symbol in tickerSymbols}
+
+    def _readPrices(self, tickerSymbol: str, startDate: datetime.date, endDate: datetime.date, fields: list[str]) -> dict:
+        """ 
+            The values are slices of the memory mapped files, only the dates are
+            copied to convert them to datetime64[D].
+        """
+        numberOfRows = self._numberOfRows(tickerSymbol)
+        dates = self._column(tickerSymbol, "Date", numberOfRows)
+
+        # The dates are sorted, so the range is found with a binary search.
+        start = 0 if startDate is None else np.searchsorted(dates, dateToDays(startDate), side="left")
+        end = numberOfRows if endDate is None else np.searchsorted(dates, dateToDays(endDate), side="right")
+
+        prices = {field: self._column(tickerSymbol, field, numberOfRows)[start:end] for field in fields}
+        if "Date" in prices:
+            prices["Date"] = prices["Date"].astype(PRICE_FIELDS["Date"])
+        return prices
+
+
+class SQLite(DatabaseClient):
+    """ 
+        Embedded database client that keeps everything in one SQLite file, for
+        running on a single machine without a database server.
+
+        The quotes table is keyed on (symbol, date) and stored WITHOUT ROWID, so
+        the rows of a stock are clustered in date order and the key covers every
+        range read. Writing a quote that is already stored replaces it. Writes
+        are sent with executemany in one transaction per batch of batchSize
+        quotes, and the database is in WAL mode so reads do not block on writes.
+
+        Every thread gets its own connection. Dates are stored as the number of
+        days since 1970-01-01.
+    """
+
+    # Field name and column of every quote field.
+    COLUMNS = {
+        "Date": "date",
+        "Open": "open",
+        "High": "high",
+        "Low": "low",
+        "Close": "close",
+        "Adj Close": "adjClose",
+        "Volume": "volume",
+    }
+
+    def __init__(self, path: str = "Stocks.db", batchSize: int = 1000):
+        self.path = path
+        self.batchSize = batchSize
+
+        # Thread id to the connection of that thread.
+        self._connections = {}
+        self._lock = threading.Lock()
+        self.open()
+
+    def _connection(self) -> sqlite3.Connection:
+        """ Returns the connection of the current thread, connecting on first use. """
+        thread = threading.get_ident()
+        connection = self._connections.get(thread)
+        if connection is None:
+            connection = sqlite3.connect(self.path, check_same_thread=False)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            with self._lock:
+                self._connections[thread] = connection
+        return connection
+
+    def open(self):
+        with self._connection() as connection:
+            connection.executescript("""
+                CREATE TABLE IF NOT EXISTS quotes (
+                    symbol TEXT NOT NULL,
+                    date INTEGER NOT NULL,
+                    open REAL NOT NULL,
+                    high REAL NOT NULL,
+                    low REAL NOT NULL,
+                    close REAL NOT NULL,
+                    adjClose REAL NOT NULL,
+                    volume INTEGER NOT NULL,
+                    PRIMARY KEY (symbol, date)
+                ) WITHOUT ROWID;
+                CREATE TABLE IF NOT EXISTS ciks (
+                    symbol TEXT PRIMARY KEY,
+                    cik INTEGER NOT NULL
+                ) WITHOUT ROWID;
+            """)
+
+    def close(self):
+        """ Closes the connections of every thread. """
+        with self._lock:
+            connections = list(self._connections.values())
+            self._connections.clear()
+        for connection in connections:
+            connection.close()
+
+    def _writeQuoteEntries(self, tickerSymbol: str, entries: Iterable[dict]):
+        symbol = tickerSymbol.upper()
+        connection = self._connection()
+        for batch in batched(entries, self.batchSize):
+            rows = [(symbol, dateToDays(entry["Date"]), entry["Open"], entry["High"], entry["Low"],
+                     entry["Close"], entry["Adj Close"], entry["Volume"]) for entry in batch]
+            with connection:
+                connection.executemany("""
+                    INSERT INTO quotes VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                    ON CONFLICT (symbol, date) DO UPDATE SET
+                        open = excluded.open, high = excluded.high, low = excluded.low, close = excluded.close,
+                        adjClose = excluded.adjClose, volume = excluded.volume
+                """, rows)
+
+    def _writeCIKEntries(self, entries: Iterable[dict]):
+        """ Replaces the ticker symbol to CIK table in one transaction. """
+        connection = self._connection()
+        with connection:
+            connection.execute("DELETE FROM ciks")
+            for batch in batched(entries, self.batchSize):
+                connection.executemany("INSERT OR REPLACE INTO ciks VALUES (?, ?)",
+                                       [(entry["Symbol"], entry["CIK"]) for entry in batch])
+
+    def getCIK(self, tickerSymbol: str) -> str:
+        """ 
+            Returns the string reperesentation of the CIK number
+            for a companies ticker symbol.
+        """
+        row = self._connection().execute("SELECT cik FROM ciks WHERE symbol = ?", (tickerSymbol.upper(),)).fetchone()
+        return None if row is None else str(row[0])
+
+    def getCIKs(self, tickerSymbols: Iterable[str]) -> dict:
+        """ Looks the symbols up a batch at a time. """
+        tickerSymbols = list(tickerSymbols)
+        ciks = {}
+        connection = self._connection()
+        for batch in batched({symbol.upper() for symbol in tickerSymbols}, 500):
+            query = "SELECT symbol, cik FROM ciks WHERE symbol IN (%s)" % ", ".join("?" * len(batch))
+            ciks.update((symbol, str(cik)) for symbol, cik in connection.execute(query, batch))
+        return {symbol: ciks.get(symbol.upper()) for symbol in tickerSymbols}
+
+    def getStoredDates(self, tickerSymbol: str) -> list[datetime.date]:
+        rows = self._connection().execute("SELECT date FROM quotes WHERE symbol = ? ORDER BY date", (tickerSymbol.upper(),))
+        return np.array([row[0] for row in rows], dtype=np.int64).astype(PRICE_FIELDS["Date"]).tolist()
+
+    def _readPrices(self, tickerSymbol: str, startDate: datetime.date, endDate: datetime.date, fields: list[str]) -> dict:
+        """ The range is read from the primary key, so only the rows of the range are visited. """
+        query = "SELECT %s FROM quotes WHERE symbol = ?" % ", ".join(self.COLUMNS[field] for field in fields)
+        params = [tickerSymbol.upper()]
+        if startDate is not None:
+            query += " AND date >= ?"
+            params.append(dateToDays(startDate))
+        if endDate is not None:
+            query += " AND date <= ?"
+            params.append(dateToDays(endDate))
+        query += " ORDER BY date"
+
+        # Dates are read as integers and converted once the array is built.
+        dtype = [(field, np.int64 if field == "Date" else PRICE_FIELDS[field]) for field in fields]
+        rows = np.array(self._connection().execute(query, params).fetchall(), dtype=dtype)
+        return {field: rows[field].astype(PRICE_FIELDS[field]) for field in fields}
+
+
+class WriteBehindClient(DatabaseClient):
+    """ 
+        Wraps another database client so writes return once their entries are
+        queued, while a background thread writes them to the wrapped client. The
+        caller can then start its next download while the database is busy.
+
+        Quotes are written in batches of up to batchSize entries, or of whatever
+        is queued once the oldest entry waited flushInterval seconds. At most
+        maxQueueSize entries wait in the queue, writers block once it is full.
+        A CIK table is written as a whole since it replaces the stored one.
+
+        Reads go to the wrapped client directly and do not wait for queued
+        writes, call flush first to read them back. An error raised by the
+        wrapped client is raised again by the next flush or close. Queued
+        entries are lost if the process exits before close is called.
+
+        Public members:
+            batchLatencies (deque): Seconds taken by each of the latest 1000 batches.
+    """
+    # Queued to stop the writer thread.
+    _STOP = object()
+
+    def __init__(self, client: DatabaseClient, maxQueueSize: int = 10000, batchSize: int = 1000, flushInterval: float = 1.0):
+        self.client = client
+        self.batchSize = batchSize
+        self.flushInterval = flushInterval
+
+        # Metrics
+        self.batches = 0
+        self.entriesWritten = 0
+        self.blockedWrites = 0
+        self.batchLatencies = deque(maxlen=1000)
+
+        self._queue = queue.Queue(maxsize=maxQueueSize)
+        self._error = None
+        self._thread = None
+        self.open()
+
+    @property
+    def acceptsBackdatedQuotes(self) -> bool:
+        return self.client.acceptsBackdatedQuotes
+
+    @property
+    def metrics(self) -> dict:
+        """ Get the batch counters, the queue length and the latency of the batches in seconds. """
+        latencies = list(self.batchLatencies)
+        return {
+            "batches": self.batches,
+            "entriesWritten": self.entriesWritten,
+            "queued": self._queue.qsize(),
+            "blockedWrites": self.blockedWrites,
+            "lastBatchLatency": latencies[-1] if latencies else 0.0,
+            "maxBatchLatency": max(latencies, default=0.0),
+        }
+
+    def open(self):
+        """ Opens the wrapped client and starts the writer thread. """
+        self.client.open()
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._run, name="WriteBehindClient", daemon=True)
+            self._thread.start()
+
+    def close(self):
+        """ Writes everything that is queued, stops the writer thread and closes the wrapped client. """
+        if self._thread is not None:
+            self._put(self._STOP)
+            self._thread.join()
+            self._thread = None
+        self.client.close()
+        self._raiseError()
+
+    def flush(self):
+        """ Blocks until everything queued before the call is written. Raises a ValueError once closed. """
+        done = threading.Event()
+        self._put(done)
+        done.wait()
+        self._raiseError()
+
+    def _raiseError(self):
+        error, self._error = self._error, None
+        if error is not None:
+            raise error
+
+    def _put(self, item):
+        """ Queues an item, blocking while the queue is full. """
+        if self._thread is None:
+            raise ValueError("The client is closed, open it again before writing.")
+
+        try:
+            self._queue.put_nowait(item)
+        except queue.Full:
+            self.blockedWrites += 1
+            self._queue.put(item)
+
+    def _writeQuoteEntries(self, tickerSymbol: str, entries: Iterable[dict]):
+        for entry in entries:
+            self._put((tickerSymbol, entry))
+
+    def _writeCIKEntries(self, entries: Iterable[dict]):
+        self._put((None, list(entries)))
+
+    def _run(self):
+        pending = []
+        deadline = None
+        while True:
+            try:
+                item = self._queue.get(timeout=None if not pending else max(0.0, deadline - time.monotonic()))
+            except queue.Empty:
+                # The oldest entry waited flushInterval seconds.
+                self._writeBatch(pending)
+                pending = []
+                continue
+
+            if item is self._STOP or isinstance(item, threading.Event) or item[0] is None:
+                self._writeBatch(pending)
+                pending = []
+                if item is self._STOP:
+                    return
+                elif isinstance(item, threading.Event):
+                    item.set()
+                else:
+                    self._write(self.client._writeCIKEntries, item[1])
+                continue
+
+            pending.append(item)
+            if len(pending) == 1:
+                deadline = time.monotonic() + self.flushInterval
+            if len(pending) >= self.batchSize:
+                self._writeBatch(pending)
+                pending = []
+
+    def _writeBatch(self, pending: list):
+        """ Writes queued quotes to the wrapped client, one call per ticker symbol. """
+        entries = {}
+        for tickerSymbol, entry in pending:
+            entries.setdefault(tickerSymbol, []).append(entry)
+
+        for tickerSymbol, symbolEntries in entries.items():
+            self._write(self.client._writeQuoteEntries, tickerSymbol, symbolEntries)
+
+    def _write(self, method, *args):
+        """ Calls a write method of the wrapped client, timing it and keeping its error for the caller. """
+        start = time.monotonic()
+        try:
+            method(*args)
+        except Exception as error:
+            self._error = error
+            return
+
+        self.batchLatencies.append(time.monotonic() - start)
+        self.batches += 1
+        self.entriesWritten += len(args[-1])
+
+    def getCIK(self, tickerSymbol: str) -> str:
+        return self.client.getCIK(tickerSymbol)
+
+    def getCIKs(self, tickerSymbols: Iterable[str]) -> dict:
+        return self.client.getCIKs(tickerSymbols)
+
+    def getStoredDates(self, tickerSymbol: str) -> list[datetime.date]:
+        return self.client.getStoredDates(tickerSymbol)
+
+    def _readPrices(self, tickerSymbol: str, startDate: datetime.date, endDate: datetime.date, fields: list[str]) -> dict:
+        return self.client._readPrices(tickerSymbol, startDate, endDate, fields)
@@ -0,0 +1,121 @@
+"""
+Fetches files from SEC EDGAR concurrently while staying within the request
+rate the SEC allows, and keeps a local cache of the responses.
+"""
+from concurrent.futures import ThreadPoolExecutor
+from requests.adapters import HTTPAdapter
+from rateLimiter import TokenBucket
+import requests
+import hashlib
+import json
+import os
+import re
+import threading
+
+
+# Paths of the files of one filing contain its accession number, either as a
+# directory of 18 digits or as 0000000000-00-000000. Those files never change.
+_ACCESSION_PATTERN = re.compile(r"/Archives/edgar/data/\d+/(\d{18}/|\d{10}-\d{2}-\d{6})")
+
+def isImmutable(url: str) -> bool:
+    """ Returns whether url is a file of a filing, which is never changed after it is published. """
+    return _ACCESSION_PATTERN.search(url) is not None
+
+
+class EdgarFetcher:
+    """
+    Downloads EDGAR files with up to maxWorkers concurrent requests, limited to
+    requestsPerSecond in total (the SEC allows 10). The SEC requires every request
+    to identify the caller through userAgent, such as "Company Name admin@company.com".
+
+    Responses are cached in cacheDirectory under the sha256 of their url. Cached
+    filings are returned without a request, other files such as the indexes are
+    revalidated with their ETag or Last-Modified date and only downloaded again
+    when they changed.
+
+    Public members:
+        cacheHits (int): Responses returned from the cache without a request.
+        revalidated (int): Cached responses the server confirmed were unchanged.
+        downloads (int): Responses that were downloaded.
+    """
+    def __init__(self, userAgent: str, cacheDirectory: str = "EdgarCache", requestsPerSecond: float = 10.0, maxWorkers: int = 10):
+        self.cacheDirectory = cacheDirectory
+        self.maxWorkers = maxWorkers
+        os.makedirs(cacheDirectory, exist_ok=True)
+
+        self.session = requests.Session()
+        self.session.headers.update({"User-Agent": userAgent, "Accept-Encoding": "gzip, deflate"})
+        adapter = HTTPAdapter(pool_connections=maxWorkers, pool_maxsize=maxWorkers)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self._rateLimiter = TokenBucket(requestsPerSecond)
+
+        self._lock = threading.Lock()
+        self.cacheHits = 0
+        self.revalidated = 0
+        self.downloads = 0
+
+    def _cachePath(self, url: str) -> str:
+        return os.path.join(self.cacheDirectory, hashlib.sha256(url.encode()).hexdigest())
+
+    def _readCache(self, url: str):
+        """ Returns the cached headers and content of url, or (None, None) when it is not cached. """
+        path = self._cachePath(url)
+        try:
+            with open(path + ".json") as fp:
+                headers = json.load(fp)
+            with open(path, "rb") as fp:
+                return headers, fp.read()
+        except FileNotFoundError:
+            return None, None
+
+    def _writeCache(self, url: str, response: requests.Response):
+        """ Writes the content first and then the headers, each in one step, so a cached entry is always complete. """
+        path = self._cachePath(url)
+        headers = {"url": url, "ETag": response.headers.get("ETag"), "Last-Modified": response.headers.get("Last-Modified")}
+        for suffix, data in (("", response.content), (".json", json.dumps(headers).encode())):
+            with open(path + suffix + ".tmp", "wb") as fp:
+                fp.write(data)
+            os.replace(path + suffix + ".tmp", path + suffix)
+
+    def get(self, url: str) -> bytes:
+        """ Returns the content of url, from the cache when it is still current. """
+        cachedHeaders, content = self._readCache(url)
+        if content is not None and isImmutable(url):
+            with self._lock:
+                self.cacheHits += 1
+            return content
+
+        headers = {}
+        if cachedHeaders is not None:
+            if cachedHeaders["ETag"]:
+                headers["If-None-Match"] = cachedHeaders["ETag"]
+            if cachedHeaders["Last-Modified"]:
+                headers["If-Modified-Since"] = cachedHeaders["Last-Modified"]
+
+        self._rateLimiter.acquire()
+        with self.session.get(url, headers=headers) as response:
+            if response.status_code == 304 and content is not None:
+                with self._lock:
+                    self.revalidated += 1
+                return content
+
+            response.raise_for_status()
+            self._writeCache(url, response)
+            with self._lock:
+                self.downloads += 1
+            return response.content
+
+    def getMany(self, urls: list[str]) -> dict:
+        """
+        Description: Fetches several urls concurrently.
+        Returns: A dictionary of url to its content, or to the exception raised while fetching it.
+        """
+        def fetch(url):
+            try:
+                return self.get(url)
+            except Exception as error:
+                return error
+
+        with ThreadPoolExecutor(max_workers=self.maxWorkers) as executor:
+            return dict(zip(urls, executor.map(fetch, urls)))
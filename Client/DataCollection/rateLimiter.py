@@ -0,0 +1,36 @@
+"""
+Rate limiting for the web requests made while collecting data.
+"""
+import threading
+import time
+
+
+class TokenBucket:
+    """
+    Token bucket rate limiter that can be shared between threads. Tokens are
+    added at rate per second up to capacity, and every request takes one.
+    """
+    def __init__(self, rate: float, capacity: float = 1.0):
+        if rate <= 0:
+            raise ValueError("The rate must be greater than 0.")
+
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._lastRefill = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """
+        Blocks until a token is available. A token is reserved before waiting,
+        so callers are served in the order they arrive.
+        """
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + ((now - self._lastRefill) * self.rate))
+            self._lastRefill = now
+            self._tokens -= 1
+            wait = -self._tokens / self.rate
+
+        if wait > 0:
+            time.sleep(wait)
@@ -5,16 +5,103 @@ Different indicators that could be add
 """
 from typing import List
 from abc import ABC, abstractmethod
+import numpy as np
 from Client.DataCollection import dataManagement
 
 
+# ---------------------------------------
+# Array kernels shared by the indicators
+# ----------------------------------------
+# Largest power of the decay factor the exponential filter will divide by
+# before it starts a new block, keeps the scaled values far from overflow.
+_MAX_FILTER_EXPONENT = np.log(1e200)
+
+
+def _rollingMean(values: np.ndarray, period: int) -> np.ndarray:
+    """ 
+        Returns the mean of every full window of period values along the first
+        axis using a cumulative sum. The result has len(values) - period + 1 rows.
+    """
+    # Summing the distance from the first value keeps the running total small,
+    # which limits the rounding error left after the differences are taken.
+    offset = values[0]
+    cumulative = np.cumsum(values - offset, axis=0)
+    sums = np.empty((len(values) - period + 1,) + values.shape[1:])
+    sums[0] = cumulative[period - 1]
+    sums[1:] = cumulative[period:] - cumulative[:-period]
+    return sums / period + offset
+
+
+def _exponentialFilter(values: np.ndarray, alpha, initial) -> np.ndarray:
+    """
+        Applies y[t] = alpha * values[t] + (1 - alpha) * y[t - 1] along the first
+        axis, where y[-1] is initial. alpha and initial broadcast against the
+        remaining axes, so several smoothing factors can share one pass.
+
+        The recursion is unrolled into a cumulative sum of values scaled by the
+        inverse powers of the decay. Blocks are kept short enough that those
+        powers cannot overflow, and the last value of a block seeds the next.
+    """
+    alpha = np.asarray(alpha, dtype=np.float64)
+    decay = 1.0 - alpha
+    shape = np.broadcast_shapes(values.shape, (1,) + alpha.shape)
+    filtered = np.empty(shape)
+    if len(values) == 0:
+        return filtered
+
+    # No memory of previous values, the filter output is the input.
+    if np.all(decay == 0):
+        filtered[:] = values
+        return filtered
+
+    with np.errstate(divide="ignore"):
+        blockLength = int(_MAX_FILTER_EXPONENT / np.max(-np.log(decay[decay > 0])))
+    blockLength = max(1, min(len(values), blockLength))
+
+    # Powers of the decay for one block, shaped to broadcast against the values.
+    powers = np.moveaxis(np.power.outer(decay, np.arange(1, blockLength + 1)), -1, 0)
+    if values.ndim > powers.ndim:
+        powers = powers.reshape(powers.shape + (1,) * (values.ndim - powers.ndim))
+
+    previous = np.asarray(initial, dtype=np.float64)
+    for start in range(0, len(values), blockLength):
+        block = values[start:start + blockLength]
+        blockPowers = powers[:len(block)]
+        filtered[start:start + len(block)] = blockPowers * (previous + alpha * np.cumsum(block / blockPowers, axis=0))
+        previous = filtered[start + len(block) - 1]
+
+    return filtered
+
+
+def _macd(filled: np.ndarray, fastPeriod: int, slowPeriod: int, signalPeriod: int) -> tuple:
+    """ 
+        Returns the fast EMA, slow EMA, MACD line and signal line of prices without
+        missing values. The fast and slow EMAs are computed in the same pass of the filter.
+    """
+    smoothing = np.array([2 / (fastPeriod + 1), 2 / (slowPeriod + 1)])
+    smoothing = smoothing.reshape((2,) + (1,) * (filled.ndim - 1))
+
+    averages = np.empty((len(filled), 2) + filled.shape[1:])
+    averages[:1] = filled[:1, np.newaxis]
+    averages[1:] = _exponentialFilter(filled[1:, np.newaxis], smoothing, filled[0])
+    macdLine = averages[:, 0] - averages[:, 1]
+
+    signalLine = np.empty(macdLine.shape)
+    signalLine[:1] = macdLine[:1]
+    signalLine[1:] = _exponentialFilter(macdLine[1:], 2 / (signalPeriod + 1), macdLine[0])
+
+    return averages[:, 0], averages[:, 1], macdLine, signalLine
+
+
 class Indicators(ABC):
     def __init__(self, data: List[float], period: int):
         if len(data) < period:
             raise ValueError("The list of data items must be greater than the stated time period used for calculations.")
         self._name = "NO_NAME_GIVEN"
         self.period = period
-        self.data = data
+        # Any sequence or buffer of prices is accepted. Arrays that are already
+        # float64 are used without copying.
+        self.data = np.asarray(data, dtype=np.float64)
         self._currentValue = None
         super(Indicators, self).__init__()
         
@@ -27,6 +114,14 @@ class Indicators(ABC):
     def graph(self):
         pass
 
+    @abstractmethod
+    def update(self, price: float) -> float:
+        """ 
+            Streams a new price into the indicator and returns the new current value.
+            Only the running state is updated, the historical data is left as is.
+        """
+        raise NotImplementedError("Implement method.")
+
     @property
     def Name(self):
         return self._name
@@ -47,23 +142,33 @@ class SimpleMovingAverage(Indicators):
         self._currentValue = self._calculate()
         self._name = "Simple Moving Average (SMA)"
 
-    def calculatePastIndicator(self) -> List[float]:
-        """ Returns a list of simple moving averages. """
-        i = 0
-        values = []
-        while i < len(self.data) - self.period + 1:
-            sma = 0
-            for item in range(i, self.period + i):
-                sma += self.data[item]
-
-            values.append(sma / self.period)
-            i += 1
+        # Streaming state: ring buffer of the current window and its running sum.
+        self._window = self.data[-period:].tolist()
+        self._windowIndex = 0
+        self._windowSum = sum(self._window)
 
-        return values
+    def calculatePastIndicator(self) -> np.ndarray:
+        """ Returns an array of simple moving averages, one for every full period. """
+        return _rollingMean(self.data, self.period)
  
     def _calculate(self):
         """ Returns the newest value available """
-        return self.calculatePastIndicator()[-1]
+        return float(np.sum(self.data[-self.period:]) / self.period)
+
+    def update(self, price: float) -> float:
+        """ Replaces the oldest price in the window with price in constant time. """
+        oldest = self._window[self._windowIndex]
+        self._window[self._windowIndex] = price
+        self._windowIndex = (self._windowIndex + 1) % self.period
+
+        # Resum once per full turn of the buffer so rounding error cannot build up.
+        if self._windowIndex == 0:
+            self._windowSum = sum(self._window)
+        else:
+            self._windowSum += price - oldest
+
+        self._currentValue = self._windowSum / self.period
+        return self._currentValue
 
     def graph(self):
         pass
@@ -75,19 +180,30 @@ class ExponentialMovingAverage(Indicators):
         self._currentValue = self._calculate(period)
         self._name = "Exponential Moving Average (EMA)"
 
-    def calculatePastIndicator(self) -> List[float]:
-        """ Returns a list of ema values """
-        values = [self.data[0]]
-        ema = self.data[0]
-        K = 2 / (self.period + 1)
-        for i in range(1, len(self.data)):
-            ema = (self.data[i] * K) + (ema * (1 - K))
-            values.append(ema)
-
+    @property
+    def smoothing(self) -> float:
+        """ The weight K given to the newest price. """
+        return 2 / (self.period + 1)
+
+    def calculatePastIndicator(self) -> np.ndarray:
+        """ Returns an array of ema values seeded with the first price. """
+        values = np.empty(len(self.data))
+        values[0] = self.data[0]
+        values[1:] = _exponentialFilter(self.data[1:], self.smoothing, self.data[0])
         return values
     
     def _calculate(self, period: int):
-        return self.calculatePastIndicator()[-1]
+        """ Weighted sum of the prices, the same value as the last item of the past indicator. """
+        K = self.smoothing
+        weights = np.power(1 - K, np.arange(len(self.data) - 1, -1, -1, dtype=np.float64))
+        weights[1:] *= K
+        return float(np.dot(weights, self.data))
+
+    def update(self, price: float) -> float:
+        """ Smooths price into the last ema value. """
+        K = self.smoothing
+        self._currentValue = (price * K) + (self._currentValue * (1 - K))
+        return self._currentValue
 
     def graph(self):
         pass
@@ -104,30 +220,60 @@ class RSI(Indicators):
     def __init__(self, data: List[float], period: int = 14):
         super().__init__(data, period)
 
-        if period > len(data):
+        if period >= len(data):
             raise ValueError("Number of data items must be greater than period")
 
+        # Wilder's averaged gains and losses, also the state used by update.
+        self._averageGain = None
+        self._averageLoss = None
+        self._lastPrice = float(self.data[-1])
         self._currentValue = self._calculate()
         self._overSoldValue = _RSI_OVER_SOLD
         self._overBoughtValue = _RSI_OVER_BOUGHT 
         self._name = "Relative Strength Index (RSI)"
 
-    def _calculate(self):
-        # Find up days and downdays
-        upDays = 0
-        downDays = 0
+    def calculatePastIndicator(self) -> np.ndarray:
+        """ Returns an array of RSI values, one for every price after the first period moves. """
+        return batchRSI(self.data, self.period)[self.period:]
 
-        for i in range(1, len(self.data)):
-            move = self.data[i] - self.data[i - 1]
-            if move >= 0:
-                upDays += move
-            else:
-                downDays += abs(move)
+    def calculatePastOverBought(self) -> np.ndarray:
+        """ Returns a boolean array marking the past RSI values above the overbought level. """
+        return self.calculatePastIndicator() > self._overBoughtValue
 
-        RS = (upDays / 14) / (downDays / 14)
-        RSI = (100 - (100 / (1 + RS)))
+    def calculatePastOverSold(self) -> np.ndarray:
+        """ Returns a boolean array marking the past RSI values below the oversold level. """
+        return self.calculatePastIndicator() < self._overSoldValue
 
-        return RSI
+    def _calculate(self):
+        # Find the gains and losses for each move.
+        moves = np.diff(self.data)
+        changes = np.column_stack((np.maximum(moves, 0), np.maximum(-moves, 0)))
+
+        # Seed with the average of the first period moves, then apply Wilder's smoothing.
+        averages = np.mean(changes[:self.period], axis=0)
+        if len(changes) > self.period:
+            averages = _exponentialFilter(changes[self.period:], 1 / self.period, averages)[-1]
+
+        self._averageGain, self._averageLoss = float(averages[0]), float(averages[1])
+        return self._relativeStrengthIndex()
+
+    def _relativeStrengthIndex(self) -> float:
+        """ Converts the averaged gains and losses into the RSI value. """
+        if self._averageLoss == 0:
+            return 100.0
+
+        RS = self._averageGain / self._averageLoss
+        return 100 - (100 / (1 + RS))
+
+    def update(self, price: float) -> float:
+        """ Adds the move to price into Wilder's averages. """
+        move = price - self._lastPrice
+        self._lastPrice = price
+        self._averageGain = ((self._averageGain * (self.period - 1)) + max(move, 0)) / self.period
+        self._averageLoss = ((self._averageLoss * (self.period - 1)) + max(-move, 0)) / self.period
+
+        self._currentValue = self._relativeStrengthIndex()
+        return self._currentValue
 
     @property
     def overBought(self):
@@ -142,20 +288,204 @@ class RSI(Indicators):
 
 
 class MACD(Indicators):
-    def __init__(self, data: List[float], period: int):
-        super().__init__(data, period)
-        
+    """ 
+        Difference between a fast and a slow EMA (the MACD line), an EMA of that
+        difference (the signal line) and the gap between the two (the histogram).
+        The current value is the newest MACD line value.
+    """
+    def __init__(self, data: List[float], fastPeriod: int = 12, slowPeriod: int = 26, signalPeriod: int = 9):
+        super().__init__(data, slowPeriod)
+        if fastPeriod >= slowPeriod:
+            raise ValueError("The fast period must be shorter than the slow period.")
+
+        self.fastPeriod = fastPeriod
+        self.slowPeriod = slowPeriod
+        self.signalPeriod = signalPeriod
+
+        # Streaming state: the newest fast, slow and signal EMA values.
+        self._fastAverage = None
+        self._slowAverage = None
+        self._signal = None
+        self._previousHistogram = None
+
         self._name = "Moving Average Convergence Divergence"
         self._currentValue = self._calculate()
 
+    def calculatePastIndicator(self) -> tuple:
+        """ Returns arrays of the MACD line, signal line and histogram for every price. """
+        _, _, macdLine, signalLine = _macd(self.data, self.fastPeriod, self.slowPeriod, self.signalPeriod)
+        return macdLine, signalLine, macdLine - signalLine
+
     def _calculate(self):
-        pass
+        fastAverage, slowAverage, macdLine, signalLine = _macd(self.data, self.fastPeriod, self.slowPeriod, self.signalPeriod)
+        self._fastAverage = float(fastAverage[-1])
+        self._slowAverage = float(slowAverage[-1])
+        self._signal = float(signalLine[-1])
+        if len(macdLine) > 1:
+            self._previousHistogram = float(macdLine[-2] - signalLine[-2])
+
+        return float(macdLine[-1])
+
+    def update(self, price: float) -> float:
+        """ Smooths price into the fast, slow and signal EMAs and returns the new MACD line value. """
+        self._previousHistogram = self.histogram
+
+        K = 2 / (self.fastPeriod + 1)
+        self._fastAverage = (price * K) + (self._fastAverage * (1 - K))
+        K = 2 / (self.slowPeriod + 1)
+        self._slowAverage = (price * K) + (self._slowAverage * (1 - K))
+
+        self._currentValue = self._fastAverage - self._slowAverage
+        K = 2 / (self.signalPeriod + 1)
+        self._signal = (self._currentValue * K) + (self._signal * (1 - K))
+
+        return self._currentValue
+
+    @property
+    def signal(self) -> float:
+        return self._signal
+
+    @property
+    def histogram(self) -> float:
+        return self._currentValue - self._signal
+
+    @property
+    def crossover(self) -> int:
+        """ 
+            1 if the MACD line crossed above the signal line with the newest price,
+            -1 if it crossed below and 0 otherwise.
+        """
+        if self._previousHistogram is None:
+            return 0
+        if self._previousHistogram <= 0 < self.histogram:
+            return 1
+        if self._previousHistogram >= 0 > self.histogram:
+            return -1
+        return 0
 
     def graph(self):
         pass
 
 
 
+# ---------------------------------------
+# Batch indicators for many symbols
+# ----------------------------------------
+# Every batch function takes a (bars x symbols) matrix of prices, oldest bar first,
+# and returns matrices of the same shape. NaN marks a bar without a price: leading
+# NaNs pad symbols with a shorter history and the indicator starts at their first
+# price, gaps inside a column carry the last known price forward. Bars without a
+# price, or without enough history for the indicator, are NaN in the result.
+# A 1-D array is treated as a single symbol.
+
+def _fillMissing(prices) -> tuple:
+    """ 
+        Returns the prices as a float matrix with every NaN filled, the mask of
+        the bars that had a price and the row of the first price of each column.
+    """
+    prices = np.asarray(prices, dtype=np.float64)
+    if prices.ndim == 1:
+        prices = prices[:, np.newaxis]
+
+    valid = ~np.isnan(prices)
+    rows = np.arange(len(prices))[:, np.newaxis]
+    firstValid = np.argmax(valid, axis=0)
+    columns = np.arange(prices.shape[1])
+
+    # Forward fill the gaps, then back fill the leading padding with the first price.
+    lastValid = np.maximum.accumulate(np.where(valid, rows, 0), axis=0)
+    filled = prices[lastValid, columns]
+    filled = np.where(rows < firstValid, prices[firstValid, columns], filled)
+
+    return filled, valid, firstValid
+
+
+def _shapeLike(prices, values: np.ndarray) -> np.ndarray:
+    """ Returns a single symbol result as 1-D when the prices were 1-D. """
+    return values[:, 0] if np.ndim(prices) == 1 else values
+
+
+def alignPrices(prices: dict, field: str = "Adj Close") -> tuple:
+    """ 
+        Lines up one field of several stocks, such as the output of DatabaseClient.readPrices
+        for a list of symbols, on the union of their dates. Returns the dates, the symbols
+        and a matrix with a column per symbol, NaN where a stock has no quote, which the
+        batch indicators take directly.
+    """
+    symbols = list(prices)
+    if not symbols:
+        return np.empty(0, dtype="datetime64[D]"), symbols, np.empty((0, 0))
+
+    dates = np.unique(np.concatenate([prices[symbol]["Date"] for symbol in symbols]))
+    matrix = np.full((len(dates), len(symbols)), np.nan)
+    for column, symbol in enumerate(symbols):
+        matrix[np.searchsorted(dates, prices[symbol]["Date"]), column] = prices[symbol][field]
+
+    return dates, symbols, matrix
+
+
+def batchSimpleMovingAverage(prices, period: int) -> np.ndarray:
+    """ Simple moving average of each column, NaN until a column has period prices in its window. """
+    filled, valid, _ = _fillMissing(prices)
+    sma = np.full(filled.shape, np.nan)
+    if len(filled) < period:
+        return _shapeLike(prices, sma)
+
+    # A window counts only when every bar in it had a price.
+    counts = np.rint(_rollingMean(valid.astype(np.float64), period) * period)
+    sma[period - 1:] = np.where(counts == period, _rollingMean(filled, period), np.nan)
+    return _shapeLike(prices, sma)
+
+
+def batchExponentialMovingAverage(prices, period: int) -> np.ndarray:
+    """ Exponential moving average of each column seeded with its first price. """
+    filled, valid, _ = _fillMissing(prices)
+    ema = np.empty(filled.shape)
+    ema[:1] = filled[:1]
+    ema[1:] = _exponentialFilter(filled[1:], 2 / (period + 1), filled[0])
+    return _shapeLike(prices, np.where(valid, ema, np.nan))
+
+
+def batchRSI(prices, period: int = 14) -> np.ndarray:
+    """ Wilder's RSI of each column, NaN until a column has period moves. """
+    filled, valid, firstValid = _fillMissing(prices)
+    rsi = np.full(filled.shape, np.nan)
+    if len(filled) <= period:
+        return _shapeLike(prices, rsi)
+
+    # Gains and losses for every move, stacked so they are smoothed together.
+    moves = np.diff(filled, axis=0)
+    changes = np.stack((np.maximum(moves, 0), np.maximum(-moves, 0)), axis=1)
+
+    # Wilder's averages are seeded with the mean of the first period moves of each column.
+    cumulative = np.concatenate((np.zeros((1,) + changes.shape[1:]), np.cumsum(changes, axis=0)))
+    columns = np.arange(filled.shape[1])
+    seedEnd = np.minimum(firstValid + period, len(moves))
+    seeds = (cumulative[seedEnd, :, columns] - cumulative[firstValid, :, columns]).T / period
+
+    # Holding the inputs at the seed up to the seed move keeps the filter at the seed until then.
+    seedRow = firstValid + period - 1
+    beforeSeed = (np.arange(len(moves))[:, np.newaxis] <= seedRow)[:, np.newaxis, :]
+    averages = _exponentialFilter(np.where(beforeSeed, seeds, changes), 1 / period, seeds)
+
+    averageGain, averageLoss = averages[:, 0], averages[:, 1]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        values = np.where(averageLoss == 0, 100.0, 100 - (100 / (1 + (averageGain / averageLoss))))
+
+    rsi[1:] = np.where(np.arange(1, len(filled))[:, np.newaxis] > seedRow, values, np.nan)
+    return _shapeLike(prices, np.where(valid, rsi, np.nan))
+
+
+def batchMACD(prices, fastPeriod: int = 12, slowPeriod: int = 26, signalPeriod: int = 9) -> tuple:
+    """ Returns the MACD line, signal line and histogram of each column. """
+    filled, valid, _ = _fillMissing(prices)
+    _, _, macdLine, signalLine = _macd(filled, fastPeriod, slowPeriod, signalPeriod)
+
+    macdLine = _shapeLike(prices, np.where(valid, macdLine, np.nan))
+    signalLine = _shapeLike(prices, np.where(valid, signalLine, np.nan))
+    return macdLine, signalLine, macdLine - signalLine
+
+
 def compoundCalculator(base_amount: float, rate: float, num_years: int, num_freq: int):
     assert period > 0
 
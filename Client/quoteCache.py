@@ -0,0 +1,113 @@
+"""
+In-process cache for stock quotes shared by everything that uses a
+trading client.
+"""
+from collections import OrderedDict
+from concurrent.futures import Future
+from typing import Callable, Dict, List
+import threading
+import time
+
+
+class QuoteCache:
+    """
+    Caches quotes by ticker symbol for ttl seconds and keeps at most maxSize
+    symbols, evicting the least recently used one. Callers asking for a symbol
+    while another caller is already fetching it wait for that request instead
+    of sending their own.
+
+    Public members:
+        hits (int): Quotes returned from the cache.
+        misses (int): Quotes that had to be fetched.
+        coalesced (int): Quotes that were taken from another caller's request.
+    """
+    def __init__(self, ttl: float = 1.0, maxSize: int = 1000):
+        self.ttl = ttl
+        self.maxSize = maxSize
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+
+        # Ticker symbol to (expiry time, quote), oldest use first.
+        self._quotes = OrderedDict()
+
+        # Ticker symbol to the Future of the request fetching it.
+        self._inFlight = {}
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._quotes)
+
+    @property
+    def stats(self) -> dict:
+        """ Get the hit, miss and coalesced counters and the number of cached quotes. """
+        return {"hits": self.hits, "misses": self.misses, "coalesced": self.coalesced, "size": len(self._quotes)}
+
+    def invalidate(self, tickerSymbol: str = None):
+        """ Removes the quote of tickerSymbol from the cache, or every quote if no symbol is given. """
+        with self._lock:
+            if tickerSymbol is None:
+                self._quotes.clear()
+            else:
+                self._quotes.pop(tickerSymbol, None)
+
+    def getMany(self, tickerSymbols: List[str], fetch: Callable[[List[str]], Dict[str, object]]) -> List[object]:
+        """
+        Returns the quotes of tickerSymbols in the same order. Symbols that are
+        neither cached nor being fetched are passed to fetch in one call, which
+        must return a dictionary of ticker symbol to quote. Symbols missing from
+        that dictionary have a quote of None.
+        """
+        quotes = {}
+        waiting = {}
+        fetching = {}
+
+        with self._lock:
+            now = time.monotonic()
+            for symbol in dict.fromkeys(tickerSymbols):
+                cached = self._quotes.get(symbol)
+                if cached is not None and cached[0] > now:
+                    self._quotes.move_to_end(symbol)
+                    quotes[symbol] = cached[1]
+                    self.hits += 1
+                elif symbol in self._inFlight:
+                    waiting[symbol] = self._inFlight[symbol]
+                    self.coalesced += 1
+                else:
+                    fetching[symbol] = self._inFlight[symbol] = Future()
+                    self.misses += 1
+
+        if fetching:
+            try:
+                fetched = fetch(list(fetching))
+            except BaseException as error:
+                # Callers waiting on this request see the same error.
+                with self._lock:
+                    for symbol in fetching:
+                        del self._inFlight[symbol]
+                for future in fetching.values():
+                    future.set_exception(error)
+                raise
+
+            with self._lock:
+                expires = time.monotonic() + self.ttl
+                for symbol in fetching:
+                    del self._inFlight[symbol]
+                    if fetched.get(symbol) is not None:
+                        self._store(symbol, fetched[symbol], expires)
+
+            for symbol, future in fetching.items():
+                quotes[symbol] = fetched.get(symbol)
+                future.set_result(quotes[symbol])
+
+        for symbol, future in waiting.items():
+            quotes[symbol] = future.result()
+
+        return [quotes[symbol] for symbol in tickerSymbols]
+
+    def _store(self, tickerSymbol: str, quote: object, expires: float):
+        """ Adds a quote and evicts the least recently used ones past maxSize. Called holding the lock. """
+        self._quotes[tickerSymbol] = (expires, quote)
+        self._quotes.move_to_end(tickerSymbol)
+        while len(self._quotes) > self.maxSize:
+            self._quotes.popitem(last=False)
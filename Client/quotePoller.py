@@ -0,0 +1,175 @@
+"""
+Refreshes the quotes of a watchlist at a fixed interval and keeps a bounded
+tick history for every symbol.
+"""
+from typing import List
+import threading
+import time
+import numpy as np
+
+
+# Fields kept for every tick.
+TICK_DTYPE = np.dtype([
+    ("time", np.float64),
+    ("bid", np.float64),
+    ("ask", np.float64),
+    ("lastTrade", np.float64),
+    ("bidSize", np.int64),
+    ("askSize", np.int64),
+    ("totalVolume", np.int64),
+])
+
+
+class TickRingBuffer:
+    """
+    Fixed capacity tick history for one symbol. Every tick is written twice,
+    capacity apart, so the latest ticks are always one contiguous slice and
+    can be returned as a view instead of a copy.
+    """
+    def __init__(self, capacity: int):
+        if capacity < 1:
+            raise ValueError("The capacity must be at least 1.")
+
+        self.capacity = capacity
+        self._ticks = np.zeros(2 * capacity, dtype=TICK_DTYPE)
+        self._next = 0
+        self._count = 0
+
+    def __len__(self):
+        return self._count
+
+    def append(self, tick: tuple):
+        """ Adds a tick with the values in the order of TICK_DTYPE, replacing the oldest once full. """
+        self._ticks[self._next] = tick
+        self._ticks[self._next + self.capacity] = tick
+        self._next = (self._next + 1) % self.capacity
+        self._count = min(self._count + 1, self.capacity)
+
+    def latest(self, n: int = None) -> np.ndarray:
+        """
+            Returns a view of the latest n ticks (all of them if n is None), oldest
+            first. Every append writes the slot of the oldest tick, so the view only
+            stays intact for capacity - n more appends, none once the buffer is full
+            and n is capacity. Copy it to keep it longer.
+        """
+        n = self._count if n is None else min(n, self._count)
+        end = self._next + self.capacity
+        return self._ticks[end - n:end]
+
+
+class QuotePoller:
+    """
+    Polls the quotes of tickerSymbols from a client every interval seconds on a
+    background thread and appends them to a TickRingBuffer per symbol. The client
+    must provide getQuoteBatch, such as the EtradeClient. Every poll asks it for
+    fresh quotes, so a quote cache never hands back the previous tick.
+
+    Polls are scheduled from the start time rather than from the end of the last
+    poll, so the interval does not drift. A poll that starts later than
+    lateTolerance seconds after its scheduled time counts as late, and scheduled
+    polls that passed while a poll was still running are skipped and counted as
+    missed instead of being run back to back.
+
+    Every snapshot is also written to tickLog when one is given, such as a
+    TickLogWriter, so the session can be replayed later.
+    """
+    def __init__(self, client, tickerSymbols: List[str], interval: float = 1.0, capacity: int = 23400, lateTolerance: float = None, tickLog = None):
+        self.client = client
+        self.tickLog = tickLog
+        self.tickerSymbols = [symbol.upper() for symbol in tickerSymbols]
+        self.interval = interval
+        self.lateTolerance = interval / 10 if lateTolerance is None else lateTolerance
+        self.buffers = {symbol: TickRingBuffer(capacity) for symbol in self.tickerSymbols}
+
+        # Metrics
+        self.polls = 0
+        self.latePolls = 0
+        self.missedPolls = 0
+        self.failedPolls = 0
+        self.lastError = None
+        self.lastLatency = 0.0
+        self.maxLatency = 0.0
+
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    @property
+    def metrics(self) -> dict:
+        """ Get the poll counters and the latencies of the quote requests in seconds. """
+        return {
+            "polls": self.polls,
+            "latePolls": self.latePolls,
+            "missedPolls": self.missedPolls,
+            "failedPolls": self.failedPolls,
+            "lastLatency": self.lastLatency,
+            "maxLatency": self.maxLatency,
+        }
+
+    def latest(self, tickerSymbol: str, n: int = None) -> np.ndarray:
+        """ 
+            Returns a copy of the latest n ticks of a symbol, oldest first. It is taken
+            under the lock of the poll, so polls on the background thread never change it.
+        """
+        with self._lock:
+            return self.buffers[tickerSymbol.upper()].latest(n).copy()
+
+    def pollOnce(self):
+        """ Requests one snapshot of the quotes and appends it to the tick history. """
+        start = time.monotonic()
+        batch = self.client.getQuoteBatch(self.tickerSymbols, fresh=True)
+        self.lastLatency = time.monotonic() - start
+        self.maxLatency = max(self.maxLatency, self.lastLatency)
+
+        columns = [batch.dateTimeUTC, batch.bid, batch.ask, batch.lastTrade, batch.bidSize, batch.askSize, batch.totalVolume]
+        with self._lock:
+            for i, symbol in enumerate(batch.symbols):
+                if symbol in self.buffers:
+                    self.buffers[symbol].append(tuple(column[i] for column in columns))
+
+        if self.tickLog is not None:
+            self.tickLog.write(batch)
+
+        self.polls += 1
+        return batch
+
+    def start(self):
+        """ Starts polling on a background thread. """
+        if self._thread is not None and self._thread.is_alive():
+            return
+
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="QuotePoller", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """ Stops polling and waits for the current poll to finish. """
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _run(self):
+        start = time.monotonic()
+        scheduled = 0
+        while not self._stop.is_set():
+            delay = time.monotonic() - (start + (scheduled * self.interval))
+
+            # Skip the polls whose time already passed.
+            if delay >= self.interval:
+                missed = int(delay // self.interval)
+                self.missedPolls += missed
+                scheduled += missed
+                delay -= missed * self.interval
+
+            if delay > self.lateTolerance:
+                self.latePolls += 1
+
+            try:
+                self.pollOnce()
+            except Exception as error:
+                self.failedPolls += 1
+                self.lastError = error
+
+            scheduled += 1
+            self._stop.wait(max(0.0, start + (scheduled * self.interval) - time.monotonic()))
@@ -0,0 +1,179 @@
+"""
+Append-only binary log of quote snapshots. Every tick is a fixed size record,
+so a day of ticks can be memory mapped and sliced by time without parsing.
+"""
+import datetime
+import json
+import os
+import time
+import numpy as np
+
+
+# One record per symbol and snapshot. time is when the snapshot was logged
+# and quoteTime is the time of the quote itself, both in epoch time using UTC.
+TICK_RECORD_DTYPE = np.dtype([
+    ("symbolId", np.uint32),
+    ("time", np.float64),
+    ("quoteTime", np.float64),
+    ("bid", np.float64),
+    ("ask", np.float64),
+    ("lastTrade", np.float64),
+    ("bidSize", np.int64),
+    ("askSize", np.int64),
+    ("totalVolume", np.int64),
+])
+
+# Files roll over at midnight US Eastern standard time, so one file holds the
+# pre-market, regular and after hours sessions of a trading day.
+_DAY_OFFSET_SECONDS = 5 * 3600
+
+_SYMBOLS_FILE = "symbols.json"
+
+
+def tickLogPath(directory: str, date: datetime.date) -> str:
+    """ Returns the path of the tick log file for a trading day. """
+    return os.path.join(directory, f"ticks-{date.isoformat()}.bin")
+
+
+def _tradingDay(epochTime: float) -> datetime.date:
+    return datetime.datetime.fromtimestamp(epochTime - _DAY_OFFSET_SECONDS, datetime.timezone.utc).date()
+
+
+class TickLogWriter:
+    """
+    Appends quote snapshots to a file per trading day in directory. The data is
+    flushed to disk with fsync at most every fsyncInterval seconds, and on close.
+    Symbols are stored as ids, the id of every symbol is kept in symbols.json.
+    """
+    def __init__(self, directory: str, fsyncInterval: float = 1.0):
+        self.directory = directory
+        self.fsyncInterval = fsyncInterval
+        os.makedirs(directory, exist_ok=True)
+
+        self._symbolIds = readSymbolIds(directory)
+        self._file = None
+        self._day = None
+        self._lastSync = time.monotonic()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def symbolId(self, tickerSymbol: str) -> int:
+        """ Returns the id of a symbol, adding it to symbols.json when it is new. """
+        symbolId = self._symbolIds.get(tickerSymbol)
+        if symbolId is None:
+            symbolId = self._symbolIds[tickerSymbol] = len(self._symbolIds)
+
+            # Replace the file in one step so a reader never sees it half written.
+            path = os.path.join(self.directory, _SYMBOLS_FILE)
+            with open(path + ".tmp", "w") as fp:
+                json.dump(self._symbolIds, fp)
+            os.replace(path + ".tmp", path)
+
+        return symbolId
+
+    def write(self, batch, loggedTime: float = None):
+        """
+            Appends a snapshot of quotes. batch needs the symbols and the dateTimeUTC,
+            bid, ask, lastTrade, bidSize, askSize and totalVolume columns of a QuoteBatch.
+        """
+        loggedTime = time.time() if loggedTime is None else loggedTime
+        records = np.empty(len(batch.symbols), dtype=TICK_RECORD_DTYPE)
+        records["symbolId"] = [self.symbolId(symbol) for symbol in batch.symbols]
+        records["time"] = loggedTime
+        records["quoteTime"] = batch.dateTimeUTC
+        for field in ("bid", "ask", "lastTrade", "bidSize", "askSize", "totalVolume"):
+            records[field] = getattr(batch, field)
+
+        day = _tradingDay(loggedTime)
+        if day != self._day:
+            self._rotate(day)
+
+        self._file.write(records.tobytes())
+
+        if time.monotonic() - self._lastSync >= self.fsyncInterval:
+            self.flush()
+
+    def flush(self):
+        """ Writes the buffered records to disk. """
+        if self._file is not None:
+            self._file.flush()
+            os.fsync(self._file.fileno())
+        self._lastSync = time.monotonic()
+
+    def close(self):
+        if self._file is not None:
+            self.flush()
+            self._file.close()
+            self._file = None
+            self._day = None
+
+    def _rotate(self, day: datetime.date):
+        """ 
+            Closes the current file and opens the one for day. A record that was only
+            partly written before a crash is cut off, so new records stay aligned.
+        """
+        self.close()
+        path = tickLogPath(self.directory, day)
+        if os.path.exists(path):
+            with open(path, "r+b") as fp:
+                fp.seek(0, os.SEEK_END)
+                fp.truncate(fp.tell() - (fp.tell() % TICK_RECORD_DTYPE.itemsize))
+
+        self._file = open(path, "ab")
+        self._day = day
+
+
+def readSymbolIds(directory: str) -> dict:
+    """ Returns the dictionary of symbol to id written by a TickLogWriter. """
+    path = os.path.join(directory, _SYMBOLS_FILE)
+    if not os.path.exists(path):
+        return {}
+
+    with open(path) as fp:
+        return json.load(fp)
+
+
+class TickLogReader:
+    """
+    Memory maps one day of a tick log. records is a structured array of
+    TICK_RECORD_DTYPE in the order the ticks were logged. A record that was
+    only partly written is left out.
+    """
+    def __init__(self, directory: str, date: datetime.date):
+        self.directory = directory
+        self.date = date
+
+        path = tickLogPath(directory, date)
+        numberOfRecords = os.path.getsize(path) // TICK_RECORD_DTYPE.itemsize if os.path.exists(path) else 0
+        if numberOfRecords == 0:
+            self.records = np.empty(0, dtype=TICK_RECORD_DTYPE)
+        else:
+            self.records = np.memmap(path, dtype=TICK_RECORD_DTYPE, mode="r", shape=(numberOfRecords,))
+
+        self.symbolIds = readSymbolIds(directory)
+        self.symbols = {symbolId: symbol for symbol, symbolId in self.symbolIds.items()}
+
+    def __len__(self):
+        return len(self.records)
+
+    def __iter__(self):
+        return iter(self.records)
+
+    def between(self, startTime: float, endTime: float) -> np.ndarray:
+        """ Returns a view of the records logged from startTime up to, but not including, endTime. """
+        times = self.records["time"]
+        start = np.searchsorted(times, startTime, side="left")
+        end = np.searchsorted(times, endTime, side="left")
+        return self.records[start:end]
+
+    def forSymbol(self, tickerSymbol: str, records: np.ndarray = None) -> np.ndarray:
+        """ Returns the records of one symbol, from records or the whole day. """
+        records = self.records if records is None else records
+        symbolId = self.symbolIds.get(tickerSymbol)
+        if symbolId is None:
+            return records[:0]
+        return records[records["symbolId"] == symbolId]
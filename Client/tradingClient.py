@@ -3,11 +3,15 @@ from rauth import OAuth1Service
 from typing import List
 import json
 from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor
 import os.path
 import webbrowser
 import datetime
+import functools
+import numpy as np
 
 from Client.portfolio import Portfolio, Stock
+from Client.quoteCache import QuoteCache
 
 
 def printJson(jsonObj):
@@ -19,6 +23,68 @@ def writeJsonToFile(jsonObj, fileName: str):
         fp.write(json.dumps(jsonObj, indent=4))
 
 
+# --------------------------------------------------
+# Etrade timestamps
+# --------------------------------------------------
+# Etrade gives times in US Eastern time in the following format: 19:59:59 EDT 08-17-2022
+_TIMESTAMP_LENGTH = len("19:59:59 EDT 08-17-2022")
+
+# Seconds to add to an Eastern time to get UTC.
+_TIMEZONE_OFFSETS = {"EDT": 4 * 3600, "EST": 5 * 3600}
+_EPOCH_ORDINAL_SECONDS = datetime.date(1970, 1, 1).toordinal() * 86400
+
+@functools.lru_cache(maxsize=32)
+def _dateToEpochUTC(date: str) -> int:
+    """ Returns the epoch time of midnight UTC for a date in the format 08-17-2022. """
+    month, day, year = date.split("-")
+    return datetime.date(int(year), int(month), int(day)).toordinal() * 86400 - _EPOCH_ORDINAL_SECONDS
+
+def timestampToEpochUTC(timestamp: str) -> float:
+    """ 
+        Converts an Etrade timestamp (ex: 19:59:59 EDT 08-17-2022) into epoch time using UTC.
+        The date part is cached, since quotes requested together share the same date.
+    """
+    clock, timezone, date = timestamp.split(" ")
+    if timezone not in _TIMEZONE_OFFSETS:
+        raise NotImplementedError(f"Does not know the offset to implement the {timezone} timezone.")
+
+    hour, minute, second = clock.split(":")
+    seconds = (int(hour) * 3600) + (int(minute) * 60) + int(second)
+    return float(_dateToEpochUTC(date) + seconds + _TIMEZONE_OFFSETS[timezone])
+
+def timestampsToEpochUTC(timestamps: List[str]) -> np.ndarray:
+    """ Converts a column of Etrade timestamps into an array of epoch times using UTC. """
+    timestamps = list(timestamps)
+    text = "".join(timestamps).encode("ascii")
+    if len(text) != len(timestamps) * _TIMESTAMP_LENGTH:
+        return np.fromiter((timestampToEpochUTC(t) for t in timestamps), dtype=np.float64, count=len(timestamps))
+
+    # One byte per column: HH:MM:SS ZZZ MM-DD-YYYY
+    characters = np.frombuffer(text, dtype=np.uint8).reshape(len(timestamps), _TIMESTAMP_LENGTH)
+    separators = characters[:, [2, 5, 8, 12, 15, 18]]
+    if not np.all(separators == np.frombuffer(b"::  --", dtype=np.uint8)):
+        return np.fromiter((timestampToEpochUTC(t) for t in timestamps), dtype=np.float64, count=len(timestamps))
+
+    digits = characters.astype(np.int64) - ord("0")
+
+    def number(start: int, end: int) -> np.ndarray:
+        return digits[:, start:end] @ (10 ** np.arange(end - start - 1, -1, -1))
+
+    # The date part as days since the epoch.
+    months = ((number(19, 23) - 1970) * 12) + number(13, 15) - 1
+    days = months.astype("datetime64[M]").astype("datetime64[D]").astype(np.int64) + number(16, 18) - 1
+
+    offsets = np.full(len(timestamps), -1, dtype=np.int64)
+    for timezone, offset in _TIMEZONE_OFFSETS.items():
+        offsets[np.all(characters[:, 9:12] == np.frombuffer(timezone.encode("ascii"), dtype=np.uint8), axis=1)] = offset
+    if np.any(offsets < 0):
+        unknown = timestamps[np.argmax(offsets < 0)].split(" ")[1]
+        raise NotImplementedError(f"Does not know the offset to implement the {unknown} timezone.")
+
+    seconds = (number(0, 2) * 3600) + (number(3, 5) * 60) + number(6, 8)
+    return ((days * 86400) + seconds + offsets).astype(np.float64)
+
+
 class TradingClient(ABC):
     """
         Abstract class used to define a client object that can access a  single
@@ -52,6 +118,14 @@ class TradingClient(ABC):
 
 class EtradeStockQuoteAll:
     """ All dates are encoded using epoch time using UTC. """
+    __slots__ = ("symbol", "dateTimeUTC", "securityType", "quoteStatus", "afterHours", "adjustedFlag",
+                 "ask", "askSize", "askTime", "bidExchange", "bid", "bidSize", "bidTime", "changeClose",
+                 "changeClosePercentage", "companyName", "dirLast", "dividend", "eps", "estEarnings",
+                 "exDividendDate", "high", "low", "high52", "low52", "lastTrade", "open", "previousClose",
+                 "previousDayVolume", "primaryExchange", "totalVolume", "marketCap", "sharesOutstanding",
+                 "nextEarningDate", "beta", "dividendYield", "declaredDividend", "dividendPayableDate", "pe",
+                 "week52LowDate", "week52HighDate", "intrinsicValue", "timeOfLastTrade", "averageVolume")
+
     def __init__(self, values: dict):
         self.symbol = values["Product"]["symbol"]
         self.dateTimeUTC: float = float(values["dateTimeUTC"])
@@ -160,29 +234,91 @@ class EtradeStockQuoteAll:
 
     def _timestampToEpochUTC(self, timestamp: str) -> float:
         """ Etrade gives dates in the following format: 19:59:59 EDT 08-17-2022"""
-        HOUR_OFFSET_FROM_EDT = -3 # Simple offset from EDT, which should not matter for analyzing stocks during the day.
-                                    # Might be  some edge cases where this cause problems.
-        
-        # First split the time, timezone and date.
-        dateTimeValues = timestamp.split(" ")
-        if dateTimeValues[1] != "EDT":
-            raise NotImplementedError(f"Does not know the offset to implement the {dateTimeValues[1]} timezone.")
+        return timestampToEpochUTC(timestamp)
 
-        # Split into [hours, minutes, seconds]
-        timeValues = dateTimeValues[0].split(":")
+class QuoteBatch:
+    """
+    Snapshot of the quotes for several symbols stored by column. Every numeric
+    field is a typed array with one value per symbol, in the order of symbols,
+    and is read as an attribute (ex: batch.bid, batch.lastTrade).
+    """
+    # Numeric quote fields and the type of their column.
+    FIELDS = {
+        "dateTimeUTC": np.float64,
+        "bid": np.float64,
+        "bidSize": np.int64,
+        "bidTime": np.float64,
+        "ask": np.float64,
+        "askSize": np.int64,
+        "askTime": np.float64,
+        "lastTrade": np.float64,
+        "timeOfLastTrade": np.float64,
+        "open": np.float64,
+        "high": np.float64,
+        "low": np.float64,
+        "previousClose": np.float64,
+        "changeClose": np.float64,
+        "changeClosePercentage": np.float64,
+        "totalVolume": np.int64,
+        "previousDayVolume": np.int64,
+        "averageVolume": np.int64,
+    }
+    __slots__ = ("symbols", "_columns", "_positions")
+
+    def __init__(self, symbols: List[str], columns: dict):
+        self.symbols = symbols
+        self._columns = columns
+        self._positions = {symbol: i for i, symbol in enumerate(symbols)}
+
+    @classmethod
+    def fromQuotes(cls, quotes: List[EtradeStockQuoteAll]) -> "QuoteBatch":
+        """ Builds the columns from a list of quotes. """
+        columns = {}
+        for field, dtype in cls.FIELDS.items():
+            columns[field] = np.fromiter((getattr(q, field) for q in quotes), dtype=dtype, count=len(quotes))
+        return cls([q.symbol for q in quotes], columns)
+
+    @classmethod
+    def fromQuoteData(cls, quoteData: List[dict]) -> "QuoteBatch":
+        """ 
+            Builds the columns straight from the QuoteData items of a quote response,
+            converting the bid and ask times one column at a time.
+        """
+        columns = {}
+        for field, dtype in cls.FIELDS.items():
+            if field in ("bidTime", "askTime"):
+                columns[field] = timestampsToEpochUTC([q["All"][field] for q in quoteData])
+            elif field == "dateTimeUTC":
+                columns[field] = np.fromiter((q[field] for q in quoteData), dtype=dtype, count=len(quoteData))
+            else:
+                columns[field] = np.fromiter((q["All"][field] for q in quoteData), dtype=dtype, count=len(quoteData))
+        return cls([q["Product"]["symbol"] for q in quoteData], columns)
+
+    def __len__(self):
+        return len(self.symbols)
+
+    def __getattr__(self, field: str) -> np.ndarray:
+        if field.startswith("_"):
+            raise AttributeError(field)
+        try:
+            return self._columns[field]
+        except KeyError:
+            raise AttributeError(f"QuoteBatch has no field {field}.") from None
+
+    def index(self, tickerSymbol: str) -> int:
+        """ Returns the position of a symbol in every column. """
+        return self._positions[tickerSymbol]
 
-        # Split into [month, day, century year]
-        dateValues = dateTimeValues[2].split("-")
+    def row(self, tickerSymbol: str) -> dict:
+        """ Returns a dictionary of the field values for one symbol. """
+        i = self._positions[tickerSymbol]
+        return {field: column[i].item() for field, column in self._columns.items()}
 
-        year = int(dateValues[2])
-        month = int(dateValues[0])
-        day = int(dateValues[1])
-        hour = int(timeValues[0])
-        minute = int(timeValues[1])
-        second = int(timeValues[2])
-        dt = datetime.datetime(year, month, day, hour + HOUR_OFFSET_FROM_EDT, minute, second)
+    @property
+    def spread(self) -> np.ndarray:
+        """ Get the ask minus the bid of every symbol. """
+        return self.ask - self.bid
 
-        return dt.timestamp()
 
 # --------------------------------------------------
 # Etrade Client to place trades and analyze position
@@ -193,8 +329,14 @@ class EtradeClient(TradingClient):
     """
     __Max_NUMBER_OF_SYMBOLS_PER_CALL = 25
 
-    def __init__(self, dev = True):
+    def __init__(self, dev = True, maxConcurrentRequests: int = 4, quoteCacheTTL: float = 1.0, quoteCacheSize: int = 1000):
         self._dev = dev
+
+        # Quote requests for more symbols than fit in one call are sent in parallel.
+        self._quoteExecutor = ThreadPoolExecutor(max_workers=maxConcurrentRequests)
+
+        # Quotes are reused for quoteCacheTTL seconds and shared between concurrent callers.
+        self._quoteCache = QuoteCache(quoteCacheTTL, quoteCacheSize)
         
         # Parses the configuration file for etrade account configurations.
         if os.path.exists("Client/config.ini"):
@@ -276,12 +418,7 @@ class EtradeClient(TradingClient):
             Returns a json object of quote values for the given
             ticker symbols.
         """
-        url = self._base_url + "/v1/market/quote/" + tickerSymbols[0]
-
-        for i in range(1, len(tickerSymbols)):
-            url += (',' + tickerSymbols[i])
-
-        url += ".json"
+        url = self._base_url + "/v1/market/quote/" + ",".join(tickerSymbols) + ".json"
     
         response = self._session.get(url)
         json_object = json.loads(response.text)
@@ -289,13 +426,51 @@ class EtradeClient(TradingClient):
         return json_object
 
     def getStockQuote(self, ticker: str) -> EtradeStockQuoteAll:
-        quote_data = self._getStockQuote([ticker])["QuoteResponse"]["QuoteData"]
-        return EtradeStockQuoteAll(quote_data)
+        return self._quoteCache.getMany([ticker.upper()], self._fetchStockQuotes)[0]
 
-    def getMultipleStockQuotes(self, tickers: List[str]) -> List[EtradeStockQuoteAll]:
-        quotes = []
-        for q in self._getStockResponse(tickers)["QuoteResponse"]["QuoteData"]:
-            quotes.append(EtradeStockQuoteAll(q))
+    def getMultipleStockQuotes(self, tickers: List[str], fresh: bool = False) -> List[EtradeStockQuoteAll]:
+        """
+            Returns the quotes for any number of ticker symbols in the order they
+            were given, leaving out symbols without a quote. Quotes are served from
+            the quote cache when they are recent enough, unless fresh is set.
+        """
+        tickers = [ticker.upper() for ticker in tickers]
+        if fresh:
+            fetched = self._fetchStockQuotes(list(dict.fromkeys(tickers)))
+            quotes = [fetched.get(ticker) for ticker in tickers]
+        else:
+            quotes = self._quoteCache.getMany(tickers, self._fetchStockQuotes)
+        return [q for q in quotes if q is not None]
+
+    def getQuoteBatch(self, tickers: List[str], fresh: bool = False) -> QuoteBatch:
+        """ Returns the quotes for the ticker symbols as a column based QuoteBatch, see getMultipleStockQuotes. """
+        return QuoteBatch.fromQuotes(self.getMultipleStockQuotes(tickers, fresh))
+
+    @property
+    def quoteCacheStats(self) -> dict:
+        """ Get the hit, miss and coalesced counters of the quote cache. """
+        return self._quoteCache.stats
+
+    def _fetchStockQuotes(self, tickers: List[str]) -> dict:
+        """
+            Requests the quotes for any number of ticker symbols and returns a
+            dictionary of ticker symbol to quote. The symbols are split into calls
+            of at most 25 symbols, which are sent concurrently.
+        """
+        size = self.__Max_NUMBER_OF_SYMBOLS_PER_CALL
+        chunks = [tickers[i:i + size] for i in range(0, len(tickers), size)]
+
+        if len(chunks) == 1:
+            responses = [self._getStockResponse(chunks[0])]
+        else:
+            # map returns the responses in the order of the chunks.
+            responses = self._quoteExecutor.map(self._getStockResponse, chunks)
+
+        quotes = {}
+        for response in responses:
+            for q in response["QuoteResponse"]["QuoteData"]:
+                quote = EtradeStockQuoteAll(q)
+                quotes[quote.symbol] = quote
 
         return quotes
 
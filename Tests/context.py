@@ -4,17 +4,23 @@
 """
 import os
 import sys
-#sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'Client')))
-#print(sys.path)
-# Client imports
 
-from ..Client import analysis as analysis
-from ..Client.tradingClient import tradingClient as client
-from ..Client.portfolio import portfolio as portfolio
+# The repository root for the Client package, and the DataCollection folder
+# since its modules import each other by module name.
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, 'Client', 'DataCollection'))
+
+# Client imports
+from Client import analysis
+from Client import tradingClient as client
+from Client import portfolio
 
 # Data Collection imports
-import Client.DataCollection.dataManagement as dataManagement 
-import Client.DataCollection.parseSEC as parseSEC
-import Client.DataCollection.yahooFinance as yahooFinance
+import dataManagement
+import ParseSEC as parseSEC
+import YahooFinance as yahooFinance
+import edgarFetcher
+import rateLimiter
 
-#from Client.DataCollection.dataManagement import DataBaseClientType
\ No newline at end of file
+from dataManagement import DataBaseClientType
@@ -5,22 +5,24 @@ import unittest
 import datetime
 
 
-from .context import analysis, portfolio, client
-from .context import yahooFinance, parseSEC
+from context import analysis, portfolio, client
+from context import yahooFinance, parseSEC
 
 
 
 class TestSECParcer(unittest.TestCase):
     def testClient(self):
-        stock = portfolio.Stock(66, 1, "MSFT")
-        stock_2 = portfolio.Stock(88, 3, "AAPL") 
-        stock_3 = portfolio.Stock(9999, 7, "AMZN") 
+        stock = portfolio.Stock("MSFT", 66, 1)
+        stock_2 = portfolio.Stock("AAPL", 88, 3) 
+        stock_3 = portfolio.Stock("AMZN", 9999, 7) 
         
         stocks = []
         stocks.append(stock)
         stocks.append(stock_2)
         stocks.append(stock_3)
-        port = portfolio.Portfolio(stocks)
+        port = portfolio.Portfolio(0.0, 0.0, stocks)
+        self.assertEqual(list(port.Stocks), ["MSFT", "AAPL", "AMZN"])
+        self.assertEqual(port.Stocks["AAPL"].NumShares, 3)
         
     
     def testOrder(self):
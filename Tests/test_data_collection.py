@@ -3,10 +3,29 @@
 
 """
 import unittest
+import datetime
+import time
+import tempfile
+import shutil
+import os
+import threading
+import numpy as np
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest import mock
 from context import dataManagement
 from context import yahooFinance as yf
 from context import DataBaseClientType
 from context import parseSEC
+from context import edgarFetcher
+from context import rateLimiter
+
+try:
+    import mongomock
+except ImportError:
+    mongomock = None
+
+
+RESOURCES = os.path.join(os.path.dirname(__file__), "Resources")
 
 
 class Test_YahooFinance_MonogoDB(unittest.TestCase):
@@ -37,6 +56,630 @@ class Test_ParseSEC_MongoDB(unittest.TestCase):
         # print(client.getCIK("Aapl"))        
 
 
+class Test_MissingDateRanges(unittest.TestCase):
+    def setUp(self):
+        # Thursday Jan 2nd to Wednesday Jan 22nd 2020 with Jan 8th to 17th missing.
+        self.storedDates = [datetime.date(2020, 1, 2), datetime.date(2020, 1, 3), datetime.date(2020, 1, 6),
+                            datetime.date(2020, 1, 7), datetime.date(2020, 1, 21), datetime.date(2020, 1, 22)]
+
+    def test_empty(self):
+        ranges = yf.missingDateRanges([], datetime.date(2020, 1, 1), datetime.date(2020, 2, 1))
+        self.assertEqual(ranges, [(datetime.date(2020, 1, 1), datetime.date(2020, 2, 1))])
+
+    def test_gaps(self):
+        ranges = yf.missingDateRanges(self.storedDates, datetime.date(2020, 1, 2), datetime.date(2020, 1, 24))
+        self.assertEqual(ranges, [(datetime.date(2020, 1, 8), datetime.date(2020, 1, 20)),
+                                  (datetime.date(2020, 1, 23), datetime.date(2020, 1, 24))])
+
+    def test_holidaysAndWeekends(self):
+        # Jan 20th is a holiday and Jan 25th and 26th are a weekend.
+        storedDates = self.storedDates[:4] + [datetime.date(2020, 1, 17)] + self.storedDates[4:]
+        ranges = yf.missingDateRanges(storedDates[4:], datetime.date(2020, 1, 17), datetime.date(2020, 1, 26))
+        self.assertEqual(ranges, [(datetime.date(2020, 1, 23), datetime.date(2020, 1, 26))])
+        ranges = yf.missingDateRanges(storedDates, datetime.date(2020, 1, 2), datetime.date(2020, 1, 22))
+        self.assertEqual(ranges, [(datetime.date(2020, 1, 8), datetime.date(2020, 1, 16))])
+
+    def test_leadingHoliday(self):
+        # Jan 1st is a holiday, so the stored dates start on the first trading day.
+        ranges = yf.missingDateRanges(self.storedDates, datetime.date(2020, 1, 1), datetime.date(2020, 1, 7))
+        self.assertEqual(ranges, [])
+        ranges = yf.missingDateRanges(self.storedDates, datetime.date(2019, 12, 26), datetime.date(2020, 1, 7))
+        self.assertEqual(ranges, [(datetime.date(2019, 12, 26), datetime.date(2020, 1, 1))])
+
+
+class LocalDownloader(yf.DownloadHistoricalStock):
+    """ Serves the quotes of the MSFT resource file instead of downloading them, and records the ranges. """
+    def __init__(self, databaseClient, firstAvailableDates=None):
+        super().__init__(databaseClient, firstAvailableDates)
+        with open(os.path.join(RESOURCES, "MSFT_01-10-20_01-10-21.csv")) as fp:
+            self.lines = fp.read().splitlines()
+        self.downloads = []
+
+    def download(self, tickerSymbol, startDate, endDate, rateLimiter=None):
+        self.downloads.append((startDate, endDate))
+        # The end of a download period is exclusive.
+        lines = [line for line in self.lines[1:] if startDate <= datetime.date.fromisoformat(line[:10]) < endDate]
+        self.dBClient.writeLines(tickerSymbol, self.lines[:1] + lines, ",")
+        return len(lines)
+
+
+class Test_Sync(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def syncTwice(self, client):
+        downloader = LocalDownloader(client)
+        downloader.download("MSFT", datetime.date(2020, 6, 3), datetime.date(2021, 1, 11))
+        first = downloader.sync("MSFT", datetime.date(2020, 1, 10), datetime.date(2021, 1, 8))
+        second = downloader.sync("MSFT", datetime.date(2020, 1, 10), datetime.date(2021, 1, 8))
+        return first, second
+
+    def test_Backdated(self):
+        client = dataManagement.SQLite(os.path.join(self.directory, "Stocks.db"))
+        first, second = self.syncTwice(client)
+        self.assertEqual(first, [(datetime.date(2020, 1, 10), datetime.date(2020, 6, 2))])
+        self.assertEqual(second, [])
+        self.assertEqual(len(client.getStoredDates("MSFT")), 252)
+        client.close()
+
+    def test_AppendOnly(self):
+        # The memory mapped store drops quotes before its last date, so they are not requested.
+        client = dataManagement.MemoryMappedStore(self.directory)
+        first, second = self.syncTwice(client)
+        self.assertEqual((first, second), ([], []))
+        self.assertEqual(len(client.getStoredDates("MSFT")), 153)
+
+        # Newer dates are still downloaded.
+        ranges = LocalDownloader(client).sync("MSFT", datetime.date(2020, 1, 10), datetime.date(2021, 1, 15))
+        self.assertEqual(ranges, [(datetime.date(2021, 1, 9), datetime.date(2021, 1, 15))])
+
+    def test_ListedLater(self):
+        # The resource starts on 2020-01-10, so nothing older is ever returned.
+        client = dataManagement.SQLite(os.path.join(self.directory, "Stocks.db"))
+        self.addCleanup(client.close)
+        downloader = LocalDownloader(client)
+        downloader.download("MSFT", datetime.date(2020, 1, 10), datetime.date(2021, 1, 9))
+
+        ranges = downloader.sync("MSFT", datetime.date(2015, 1, 2), datetime.date(2021, 1, 8))
+        self.assertEqual(ranges, [(datetime.date(2015, 1, 2), datetime.date(2020, 1, 9))])
+        self.assertEqual(downloader.firstAvailableDates, {"MSFT": datetime.date(2020, 1, 10)})
+        self.assertEqual(downloader.sync("MSFT", datetime.date(2015, 1, 2), datetime.date(2021, 1, 8)), [])
+
+        # The recorded dates carry over to a later run.
+        later = LocalDownloader(client, downloader.firstAvailableDates)
+        self.assertEqual(later.sync("msft", datetime.date(2015, 1, 2), datetime.date(2021, 1, 8)), [])
+        self.assertEqual(later.downloads, [])
+
+    def test_StartOnHoliday(self):
+        client = dataManagement.SQLite(os.path.join(self.directory, "Stocks.db"))
+        self.addCleanup(client.close)
+        downloader = LocalDownloader(client)
+        downloader.download("MSFT", datetime.date(2021, 1, 4), datetime.date(2021, 1, 9))
+        self.assertEqual(downloader.sync("MSFT", datetime.date(2021, 1, 1), datetime.date(2021, 1, 8)), [])
+        self.assertEqual(downloader.firstAvailableDates, {})
+
+
+class YahooHandler(BaseHTTPRequestHandler):
+    """ Stand-in for the Yahoo download url, serves the MSFT resource file for every symbol but NONE. """
+    def do_GET(self):
+        if self.path.startswith("/NONE"):
+            self.send_error(404)
+            return
+
+        with open(os.path.join(RESOURCES, "MSFT_01-10-20_01-10-21.csv"), "rb") as fp:
+            body = fp.read()
+        self.send_response(200)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class Test_DownloadMany(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.server = ThreadingHTTPServer(("127.0.0.1", 0), YahooHandler)
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.client = dataManagement.MemoryMappedStore(self.directory)
+        self.downloader = yf.DownloadHistoricalStock(self.client)
+        self.downloader.url = "http://127.0.0.1:%d/{symbol}?period1={p1}&period2={p2}" % self.server.server_address[1]
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_DownloadMany(self):
+        adapter = self.downloader.session.get_adapter(self.downloader.url)
+        start = time.monotonic()
+        results = self.downloader.downloadMany(["MSFT", "AAPL", "V", "NONE"], datetime.date(2020, 1, 10), datetime.date(2021, 1, 10),
+                                               maxWorkers=4, requestsPerSecond=20)
+        self.assertGreaterEqual(time.monotonic() - start, 3 / 20)
+        self.assertEqual([results[symbol] for symbol in ("MSFT", "AAPL", "V")], [None, None, None])
+        self.assertIsInstance(results["NONE"], Exception)
+        self.assertEqual(len(self.client.getStoredDates("AAPL")), 252)
+        self.assertIs(self.downloader.session.get_adapter(self.downloader.url), adapter)
+
+    def test_OnlyMissing(self):
+        self.downloader.download("MSFT", datetime.date(2020, 1, 10), datetime.date(2021, 1, 10))
+        results = self.downloader.downloadMany(["MSFT"], datetime.date(2020, 1, 10), datetime.date(2021, 1, 8), onlyMissing=True)
+        self.assertEqual(results, {"MSFT": None})
+        self.assertEqual(len(self.client.getStoredDates("MSFT")), 252)
+
+
+class Test_TokenBucket(unittest.TestCase):
+    def test_Rate(self):
+        bucket = rateLimiter.TokenBucket(50)
+        start = time.monotonic()
+        for _ in range(11):
+            bucket.acquire()
+        self.assertGreaterEqual(time.monotonic() - start, 10 / 50)
+        self.assertLess(time.monotonic() - start, 0.5)
+
+    def test_Threads(self):
+        bucket = rateLimiter.TokenBucket(100, capacity=5)
+        start = time.monotonic()
+        threads = [threading.Thread(target=bucket.acquire) for _ in range(25)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        # The first 5 tokens are already in the bucket.
+        self.assertGreaterEqual(time.monotonic() - start, 20 / 100)
+
+    def test_InvalidRate(self):
+        self.assertRaises(ValueError, rateLimiter.TokenBucket, 0)
+
+
+class Test_MemoryMappedStore(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.client = dataManagement.MemoryMappedStore(self.directory, batchSize=50)
+        with open(os.path.join(RESOURCES, "MSFT_01-10-20_01-10-21.csv")) as fp:
+            self.text = fp.read()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_readPrices(self):
+        self.client.writeText("MSFT", self.text, ",")
+        prices = self.client.readPrices("MSFT")
+        self.assertEqual(len(prices["Date"]), 252)
+        self.assertEqual(dataManagement.daysToDate(prices["Date"][0]), datetime.date(2020, 1, 10))
+        self.assertEqual(prices["Adj Close"][0], 159.648727)
+        self.assertEqual(prices["Volume"][0], 20725900)
+
+        prices = self.client.readPrices("MSFT", datetime.date(2020, 3, 1), datetime.date(2020, 3, 31))
+        self.assertEqual(len(prices["Close"]), 22)
+        self.assertEqual(dataManagement.daysToDate(prices["Date"][-1]), datetime.date(2020, 3, 31))
+
+    def test_readPricesMany(self):
+        self.client.writeText("MSFT", self.text, ",")
+        prices = self.client.readPrices(["MSFT", "NONE"], endDate=datetime.date(2020, 1, 31), fields=["Date", "Close"])
+        self.assertEqual(list(prices["MSFT"]), ["Date", "Close"])
+        self.assertEqual(prices["MSFT"]["Date"].dtype, np.dtype("datetime64[D]"))
+        self.assertEqual(prices["MSFT"]["Date"][-1], np.datetime64("2020-01-31"))
+        self.assertEqual(len(prices["NONE"]["Close"]), 0)
+        self.assertRaises(ValueError, self.client.readPrices, "MSFT", fields=["Price"])
+        self.assertRaises(ValueError, self.client.readPrices, "MSFT", fields=[])
+
+    def test_TornWrite(self):
+        lines = self.text.splitlines()
+        self.client.writeLines("MSFT", lines[:11], ",")
+
+        # A write that stopped after some of the value columns.
+        with open(os.path.join(self.directory, "MSFT", "Open.f8"), "ab") as fp:
+            fp.write(np.array([-1.0]).tobytes())
+        with open(os.path.join(self.directory, "MSFT", "Date.i4"), "ab") as fp:
+            fp.write(b"\x01\x02")
+
+        self.client.writeText("MSFT", self.text, ",")
+        prices = self.client.readPrices("MSFT")
+        self.assertEqual(len(prices["Date"]), 252)
+        self.assertEqual(prices["Date"][10], np.datetime64("2020-01-27"))
+        self.assertEqual(prices["Open"][10], float(lines[11].split(",")[1]))
+
+    def test_appendOnly(self):
+        lines = self.text.splitlines()
+        self.client.writeLines("MSFT", lines[:100], ",")
+        self.client.writeText("MSFT", self.text, ",")
+        self.assertEqual(len(self.client.readPrices("MSFT")["Date"]), 252)
+
+    def test_getStoredDates(self):
+        self.client.writeText("MSFT", self.text, ",")
+        dates = self.client.getStoredDates("MSFT")
+        self.assertEqual(len(dates), 252)
+        self.assertEqual(dates[0], datetime.date(2020, 1, 10))
+        self.assertEqual(self.client.getStoredDates("NONE"), [])
+
+    def test_CIK(self):
+        self.client.writeText("", "msft\t789019\naapl\t320193\n", "\t")
+        self.assertEqual(self.client.getCIK("msft"), "789019")
+        self.assertIsNone(self.client.getCIK("NONE"))
+        self.assertEqual(self.client.getCIKs(["MSFT", "aapl", "NONE"]), {"MSFT": "789019", "aapl": "320193", "NONE": None})
+
+        # A new table replaces the one kept in memory.
+        self.client.writeText("", "msft\t789019\n", "\t")
+        self.assertIsNone(self.client.getCIK("aapl"))
+        self.assertEqual(dataManagement.MemoryMappedStore(self.directory).getCIK("MSFT"), "789019")
+
+
+class Test_SQLite(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.client = dataManagement.createDatabaseClient(DataBaseClientType.SQLITE, path=os.path.join(self.directory, "Stocks.db"), batchSize=50)
+        with open(os.path.join(RESOURCES, "MSFT_01-10-20_01-10-21.csv")) as fp:
+            self.text = fp.read()
+
+    def tearDown(self):
+        self.client.close()
+        shutil.rmtree(self.directory)
+
+    def test_readPrices(self):
+        self.client.writeText("msft", self.text, ",")
+        prices = self.client.readPrices("MSFT")
+        self.assertEqual(len(prices["Date"]), 252)
+        self.assertEqual(prices["Date"][0], np.datetime64("2020-01-10"))
+        self.assertEqual(prices["Adj Close"][0], 159.648727)
+        self.assertEqual(prices["Volume"][0], 20725900)
+
+        prices = self.client.readPrices(["MSFT"], datetime.date(2020, 3, 1), datetime.date(2020, 3, 31), ["Close"])
+        self.assertEqual(len(prices["MSFT"]["Close"]), 22)
+        self.assertRaises(ValueError, self.client.readPrices, "MSFT", fields=[])
+
+    def test_Dates(self):
+        self.assertEqual(dataManagement.dateToDays(datetime.datetime(2020, 1, 10, 16)), 18271)
+        self.assertEqual(dataManagement.daysToDate(18271), datetime.date(2020, 1, 10))
+        self.assertEqual(dataManagement.daysToDate(np.datetime64("2020-01-10")), datetime.date(2020, 1, 10))
+
+    def test_Upsert(self):
+        lines = self.text.splitlines()
+        self.client.writeLines("MSFT", lines[:100], ",")
+        self.client.writeText("MSFT", self.text, ",")
+        dates = self.client.getStoredDates("MSFT")
+        self.assertEqual(len(dates), 252)
+        self.assertEqual(dates[0], datetime.date(2020, 1, 10))
+        self.assertEqual(self.client.getStoredDates("NONE"), [])
+
+    def test_Threads(self):
+        threads = [threading.Thread(target=self.client.writeText, args=(symbol, self.text, ",")) for symbol in ("MSFT", "AAPL", "V")]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(len(self.client.readPrices("V", fields=["Close"])["Close"]), 252)
+
+    def test_CIK(self):
+        self.client.writeText("", "msft\t789019\naapl\t320193\n", "\t")
+        self.assertEqual(self.client.getCIK("msft"), "789019")
+        self.assertIsNone(self.client.getCIK("NONE"))
+        self.assertEqual(self.client.getCIKs(["MSFT", "aapl", "NONE"]), {"MSFT": "789019", "aapl": "320193", "NONE": None})
+
+
+class Test_WriteBehindClient(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.store = dataManagement.SQLite(os.path.join(self.directory, "Stocks.db"))
+        with open(os.path.join(RESOURCES, "MSFT_01-10-20_01-10-21.csv")) as fp:
+            self.text = fp.read()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_Flush(self):
+        with dataManagement.WriteBehindClient(self.store, maxQueueSize=10, batchSize=100, flushInterval=60) as client:
+            client.writeText("MSFT", self.text, ",")
+            client.writeText("", "msft\t789019\n", "\t")
+            client.flush()
+            self.assertEqual(len(client.readPrices("MSFT")["Close"]), 252)
+            self.assertEqual(client.getCIK("MSFT"), "789019")
+            self.assertEqual(client.metrics["batches"], 4)
+            self.assertEqual(client.metrics["entriesWritten"], 253)
+            self.assertEqual(len(client.batchLatencies), 4)
+
+    def test_FlushInterval(self):
+        client = dataManagement.WriteBehindClient(self.store, batchSize=1000, flushInterval=0.05)
+        client.writeLines("MSFT", self.text.splitlines()[:11], ",")
+        time.sleep(0.3)
+        self.assertEqual(client.metrics["entriesWritten"], 10)
+        client.close()
+
+    def test_Closed(self):
+        client = dataManagement.WriteBehindClient(self.store)
+        client.close()
+        self.assertRaises(ValueError, client.flush)
+        self.assertRaises(ValueError, client.writeText, "MSFT", self.text, ",")
+
+        client.open()
+        client.writeText("MSFT", self.text, ",")
+        client.close()
+        self.assertEqual(len(self.store.getStoredDates("MSFT")), 252)
+
+    def test_Error(self):
+        def failingWrite(tickerSymbol, entries):
+            raise IOError("Disk full")
+
+        self.store._writeQuoteEntries = failingWrite
+        client = dataManagement.WriteBehindClient(self.store)
+        client.writeText("MSFT", self.text, ",")
+        self.assertRaises(IOError, client.flush)
+        client.close()
+
+
+class Test_MongoClientRegistry(unittest.TestCase):
+    def test_Shared(self):
+        # Options no other test uses, so only these clients share the MongoClient.
+        first = dataManagement.MongoDB(connectTimeoutMS=1234)
+        with dataManagement.MongoDB(connectTimeoutMS=1234) as second:
+            self.assertIs(first.client, second.client)
+            with dataManagement.MongoDB(connectTimeoutMS=1234, maxPoolSize=10) as third:
+                self.assertIsNot(first.client, third.client)
+        self.assertIsNone(second.client)
+
+        client = first.client
+        first.close()
+        first.open()
+        self.assertIsNot(first.client, client)
+        first.close()
+
+    @unittest.skipIf(mongomock is None, "mongomock is not installed.")
+    def test_PatchedClient(self):
+        with dataManagement.MongoDB(connectTimeoutMS=1234) as real:
+            with mock.patch.object(dataManagement, "MongoClient", mongomock.MongoClient):
+                with dataManagement.MongoDB(connectTimeoutMS=1234) as patched:
+                    self.assertIsInstance(patched.client, mongomock.MongoClient)
+            self.assertNotIsInstance(real.client, mongomock.MongoClient)
+
+
+@unittest.skipIf(mongomock is None, "mongomock is not installed.")
+class MongomockTestCase(unittest.TestCase):
+    """ Runs the MongoDB client against an in memory mongomock server. """
+    def setUp(self):
+        # Start from an empty registry so no client cached by another test is reused.
+        patchers = [mock.patch.object(dataManagement, "MongoClient", mongomock.MongoClient),
+                    mock.patch.dict(dataManagement._mongoClients, clear=True),
+                    mock.patch.dict(dataManagement._mongoClientKeys, clear=True)]
+        for patcher in patchers:
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+        self.client = dataManagement.MongoDB(batchSize=100)
+        self.addCleanup(self.client.close)
+        with open(os.path.join(RESOURCES, "MSFT_01-10-20_01-10-21.csv")) as fp:
+            self.text = fp.read()
+
+
+class Test_MongoWrites(MongomockTestCase):
+    def test_DoubleWrite(self):
+        self.client.writeText("MSFT", self.text, ",")
+        self.client.writeText("MSFT", self.text, ",")
+        self.assertEqual(self.client.StocksDB["MSFT"].count_documents({}), 252)
+        self.assertEqual(self.client.getStoredDates("MSFT")[0], datetime.date(2020, 1, 10))
+
+    def test_BatchBoundaries(self):
+        bulkWrite = mongomock.collection.Collection.bulk_write
+        with mock.patch.object(mongomock.collection.Collection, "bulk_write", autospec=True, side_effect=bulkWrite) as spy:
+            self.client.writeText("MSFT", self.text, ",")
+        self.assertEqual([len(call.args[1]) for call in spy.call_args_list], [100, 100, 52])
+
+    def test_CIKs(self):
+        self.client.writeText("", "\n".join("s%d\t%d" % (i, i) for i in range(250)), "\t")
+        self.assertEqual(self.client.getCIKs(["S0", "s249", "NONE"]), {"S0": "0", "s249": "249", "NONE": None})
+
+        # A client sharing the connection reads the table from the database.
+        other = dataManagement.MongoDB()
+        self.addCleanup(other.close)
+        self.assertEqual(other.getCIK("s120"), "120")
+
+        # Writing the table again replaces it.
+        self.client.writeText("", "s1\t1\nV\t1403161\n", "\t")
+        self.assertEqual(self.client.getCIKs(["S0", "S1", "V"]), {"S0": None, "S1": "1", "V": "1403161"})
+        self.assertEqual(self.client.StocksDB["CIK_ID"].count_documents({}), 2)
+
+    def test_readPrices(self):
+        self.client.writeText("MSFT", self.text, ",")
+        prices = self.client.readPrices("MSFT", datetime.date(2020, 3, 1), datetime.date(2020, 3, 31), ["Date", "Volume"])
+        self.assertEqual(list(prices), ["Date", "Volume"])
+        self.assertEqual(len(prices["Volume"]), 22)
+        self.assertEqual(prices["Volume"].dtype, np.int64)
+        self.assertEqual(prices["Date"][-1], np.datetime64("2020-03-31"))
+        self.assertEqual(len(self.client.readPrices(["MSFT", "NONE"])["NONE"]["Date"]), 0)
+
+class Test_MongoIndexes(MongomockTestCase):
+    def test_SymbolCase(self):
+        self.client.writeText("aapl", self.text, ",")
+        self.assertEqual(len(self.client.readPrices("AAPL")["Date"]), 252)
+        self.assertEqual(len(self.client.getStoredDates("Aapl")), 252)
+        self.assertEqual(self.client.StocksDB.list_collection_names(), ["AAPL"])
+
+    def test_ReadsDoNotCreate(self):
+        self.assertEqual(len(self.client.readPrices("NONE")["Close"]), 0)
+        self.assertEqual(self.client.getStoredDates("NONE"), [])
+        self.assertEqual(self.client.StocksDB.list_collection_names(), [])
+
+    def test_DuplicateDates(self):
+        # Quotes stored twice before the Date index existed.
+        entries = list(self.client._parseStockQuotes(self.text.splitlines(), ","))
+        for _ in range(2):
+            self.client.StocksDB["MSFT"].insert_many([dict(entry) for entry in entries[:10]])
+
+        self.client.writeText("MSFT", self.text, ",")
+        self.assertEqual(len(self.client.getStoredDates("MSFT")), 252)
+        self.assertIn("Date_1", self.client.StocksDB["MSFT"].index_information())
+
+
+FORM_INDEX = """Description:           Master Index of EDGAR Dissemination Feed by Form Type
+Last Data Received:    March 31, 2021
+
+Form Type   Company Name                                                  CIK         Date Filed  File Name
+---------------------------------------------------------------------------------------------------------------------------------------------
+10-K        MICROSOFT CORP                                                789019      2021-01-26  edgar/data/789019/0001564590-21-002316.txt
+10-K/A      SOME COMPANY, INC.                                            1234        2021-02-01  edgar/data/1234/0001234-21-000001.txt
+8-K         MICROSOFT CORP                                                789019      2021-03-15  edgar/data/789019/0001193125-21-080000.txt
+
+"""
+
+class Test_ParseFormIndex(unittest.TestCase):
+    def test_Entries(self):
+        entries = list(parseSEC.parseFormIndex(FORM_INDEX.splitlines()))
+        self.assertEqual(len(entries), 3)
+        self.assertEqual(entries[0], parseSEC.FormIndexEntry("10-K", "MICROSOFT CORP", "789019", datetime.date(2021, 1, 26),
+                                                             "edgar/data/789019/0001564590-21-002316.txt"))
+        self.assertEqual(entries[1].formType, "10-K/A")
+        self.assertEqual(entries[1].companyName, "SOME COMPANY, INC.")
+        self.assertEqual(entries[2].dateFiled, datetime.date(2021, 3, 15))
+
+    def test_NoHeader(self):
+        self.assertRaises(ValueError, list, parseSEC.parseFormIndex(["10-K  MICROSOFT CORP"]))
+
+
+class LocalSECParser(parseSEC.SECParser):
+    """ Serves the form indexes from memory and records the requested urls. """
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.requested = []
+
+    def _dailyIndexNames(self, quarter):
+        return ["form.20210315.idx"]
+
+    def _streamLines(self, url):
+        self.requested.append(url)
+        if url.endswith("form.20210315.idx"):
+            return FORM_INDEX.replace("2021-03-15", "20210315  ").splitlines()
+        return FORM_INDEX.splitlines()
+
+
+class Test_FormIndexStore(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.store = parseSEC.FormIndexStore(os.path.join(self.directory, "EdgarIndex.db"))
+        self.client = dataManagement.MemoryMappedStore(self.directory)
+        self.client.writeText("", "msft\t789019\n", "\t")
+
+    def tearDown(self):
+        self.store.close()
+        shutil.rmtree(self.directory)
+
+    def test_Filings(self):
+        self.assertEqual(self.store.load("2021/QTR1/", FORM_INDEX.splitlines()), 3)
+        self.assertEqual(self.store.load("2021/QTR1/form.20210315.idx", FORM_INDEX.splitlines()), 0)
+        self.assertTrue(self.store.isLoaded("2021/QTR1/"))
+
+        filings = self.store.filings("789019")
+        self.assertEqual([filing.formType for filing in filings], ["10-K", "8-K"])
+        self.assertEqual(self.store.filings(789019, parseSEC.FormType.TEN_K)[0].dateFiled, datetime.date(2021, 1, 26))
+        self.assertEqual(self.store.filings(789019, startDate=datetime.date(2021, 2, 1)), filings[1:])
+        self.assertEqual(self.store.filings(1), [])
+
+    def test_FilingsByDate(self):
+        self.store.load("2021/QTR1/", FORM_INDEX.splitlines())
+        filings = self.store.filingsByDate(datetime.date(2021, 2, 1))
+        self.assertEqual([filing.cik for filing in filings], ["1234", "789019"])
+        self.assertEqual(self.store.filingsByDate(datetime.date(2021, 1, 1), datetime.date(2021, 2, 1)), [self.store.filings(789019)[0], filings[0]])
+        self.assertEqual([filing.formType for filing in self.store.filingsByDate(datetime.date(2021, 1, 1), form=parseSEC.FormType.EIGHT_K)], ["8-K"])
+        self.assertEqual(self.store.filingsByDate(datetime.date(2021, 4, 1)), [])
+
+        plan = self.store._connection.execute("EXPLAIN QUERY PLAN SELECT * FROM filings WHERE dateFiled >= ?", ("2021-02-01",)).fetchall()
+        self.assertIn("filingsByDate", plan[0][-1])
+
+    def test_UpdateFormIndex(self):
+        today = datetime.date.today()
+        parser = LocalSECParser(self.client, datetime.date(today.year - 1, 1, 1), today, formIndex=self.store)
+        parser.updateFormIndex()
+        quarters = parser.quarters()
+        self.assertEqual(len(quarters), 5 + (today.month - 1) // 3)
+        self.assertEqual(len(parser.requested), len(quarters))
+        self.assertTrue(parser.requested[-1].endswith(parser.yearQuarter(today) + "form.20210315.idx"))
+
+        # Only the indexes that were not loaded yet are downloaded again.
+        parser.updateFormIndex()
+        self.assertEqual(len(parser.requested), len(quarters))
+
+        parser.startDate = datetime.date(2021, 1, 1)
+        filings = parser.getDocumentByCompany("MSFT", parseSEC.FormType.EIGHT_K)
+        self.assertEqual([filing.fileName for filing in filings], ["edgar/data/789019/0001193125-21-080000.txt"])
+
+
+
+class EdgarHandler(BaseHTTPRequestHandler):
+    """ Stand-in for the EDGAR archives, every file has the ETag "v1". """
+    requests = []
+
+    def do_GET(self):
+        EdgarHandler.requests.append(self.path)
+        if self.headers.get("If-None-Match") == '"v1"':
+            self.send_response(304)
+            self.end_headers()
+        elif self.path.startswith("/Archives/missing"):
+            self.send_error(404)
+        else:
+            body = self.path.encode()
+            self.send_response(200)
+            self.send_header("ETag", '"v1"')
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class Test_EdgarFetcher(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.server = ThreadingHTTPServer(("127.0.0.1", 0), EdgarHandler)
+        cls.url = "http://127.0.0.1:%d/Archives/" % cls.server.server_address[1]
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+
+    def setUp(self):
+        EdgarHandler.requests = []
+        self.directory = tempfile.mkdtemp()
+        self.fetcher = edgarFetcher.EdgarFetcher("Test test@example.com", self.directory, requestsPerSecond=50)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_Immutable(self):
+        self.assertTrue(edgarFetcher.isImmutable(self.url + "edgar/data/789019/000156459021002316/0001564590-21-002316-index-headers.html"))
+        self.assertTrue(edgarFetcher.isImmutable(self.url + "edgar/data/789019/0001564590-21-002316.txt"))
+        self.assertFalse(edgarFetcher.isImmutable(self.url + "edgar/full-index/2021/QTR1/form.idx"))
+
+    def test_Cache(self):
+        filing = self.url + "edgar/data/789019/0001564590-21-002316.txt"
+        index = self.url + "edgar/full-index/2021/QTR1/form.idx"
+        for _ in range(2):
+            self.assertEqual(self.fetcher.get(filing), b"/Archives/edgar/data/789019/0001564590-21-002316.txt")
+            self.assertEqual(self.fetcher.get(index), b"/Archives/edgar/full-index/2021/QTR1/form.idx")
+
+        # The filing is only requested once, the index is revalidated.
+        self.assertEqual(len(EdgarHandler.requests), 3)
+        self.assertEqual((self.fetcher.downloads, self.fetcher.cacheHits, self.fetcher.revalidated), (2, 1, 1))
+
+    def test_GetMany(self):
+        urls = [self.url + "edgar/data/1/%010d-21-000001.txt" % i for i in range(10)] + [self.url + "missing"]
+        start = time.monotonic()
+        results = self.fetcher.getMany(urls)
+        self.assertGreaterEqual(time.monotonic() - start, 10 / 50)
+        self.assertEqual(results[urls[3]], urls[3][urls[3].index("/Archives"):].encode())
+        self.assertIsInstance(results[urls[-1]], Exception)
+
+
 """
 class Test_ParseSEC_MongoDB(unittest.TestCase):
     def setUp(self):
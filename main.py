@@ -1,4 +1,5 @@
 from Client.tradingClient import EtradeClient
+from Client.quotePoller import QuotePoller
 import time
 
 def main():
@@ -6,14 +7,19 @@ def main():
 
     """
     tickers = ['TGT', 'VYM', 'INTC', 'BROS', 'NFLX']
-    quotes = client.getMultipleStockQuotes(tickers)
+    poller = QuotePoller(client, tickers, interval=5.0)
+    poller.start()
+    time.sleep(60)
+    poller.stop()
     
-    for q in quotes:
-        print(f"SYM: {q.symbol} Last: ${q.lastTrade} {time.gmtime(q.dateTimeUTC)}")
-        print(f"volume: {q.averageVolume}")
-        print(f"day low:${q.low} day high:${q.high}")
+    for ticker in tickers:
+        ticks = poller.latest(ticker, 3)
+        print(f"SYM: {ticker} Last: ${ticks['lastTrade'][-1]} {time.gmtime(ticks['time'][-1])}")
+        print(f"bid: {ticks['bid']} ask: {ticks['ask']}")
         print()
+
+    print(poller.metrics)
     """
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -0,0 +1,193 @@
+"""
+    Test file for testing the analysis module.
+
+"""
+import unittest
+import numpy as np
+
+
+from Client.analysis import SimpleMovingAverage, ExponentialMovingAverage, RSI, MACD
+from Client.analysis import batchSimpleMovingAverage, batchExponentialMovingAverage, batchRSI, batchMACD, alignPrices
+
+
+def loopSimpleMovingAverage(data, period):
+    """ Reference implementation computed one window at a time. """
+    return [sum(data[i:i + period]) / period for i in range(len(data) - period + 1)]
+
+
+def loopExponentialMovingAverage(data, period):
+    """ Reference implementation computed one price at a time. """
+    K = 2 / (period + 1)
+    values = [data[0]]
+    for price in data[1:]:
+        values.append((price * K) + (values[-1] * (1 - K)))
+    return values
+
+
+def loopRSI(data, period):
+    """ Reference implementation of Wilder's RSI for the last price. """
+    moves = [data[i] - data[i - 1] for i in range(1, len(data))]
+    averageGain = sum(max(m, 0) for m in moves[:period]) / period
+    averageLoss = sum(max(-m, 0) for m in moves[:period]) / period
+    for m in moves[period:]:
+        averageGain = ((averageGain * (period - 1)) + max(m, 0)) / period
+        averageLoss = ((averageLoss * (period - 1)) + max(-m, 0)) / period
+    return 100 - (100 / (1 + (averageGain / averageLoss)))
+
+
+class Test_MovingAverages(unittest.TestCase):
+    def setUp(self):
+        rng = np.random.default_rng(7)
+        self.prices = list(100 + np.cumsum(rng.normal(size=3000)))
+
+    def test_SimpleMovingAverage(self):
+        for period in [1, 5, 50]:
+            sma = SimpleMovingAverage(self.prices, period)
+            expected = loopSimpleMovingAverage(self.prices, period)
+            np.testing.assert_allclose(sma.calculatePastIndicator(), expected, rtol=1e-10)
+            self.assertAlmostEqual(sma.currentValue, expected[-1], places=9)
+
+    def test_ExponentialMovingAverage(self):
+        for period in [1, 2, 12, 200]:
+            ema = ExponentialMovingAverage(self.prices, period)
+            expected = loopExponentialMovingAverage(self.prices, period)
+            np.testing.assert_allclose(ema.calculatePastIndicator(), expected, rtol=1e-12)
+            self.assertAlmostEqual(ema.currentValue, expected[-1], places=9)
+
+    def test_ArrayInput(self):
+        prices = np.array(self.prices)
+        sma = SimpleMovingAverage(prices, 20)
+        self.assertIs(sma.data, prices)
+        self.assertEqual(len(sma.calculatePastIndicator()), len(prices) - 19)
+
+    def test_InvalidPeriod(self):
+        self.assertRaises(ValueError, SimpleMovingAverage, [1.0, 2.0], 3)
+
+
+class Test_RSI(unittest.TestCase):
+    def setUp(self):
+        rng = np.random.default_rng(5)
+        self.prices = list(100 + np.cumsum(rng.normal(size=500)))
+
+    def test_calculatePastIndicator(self):
+        for period in [2, 9, 14, 30]:
+            rsi = RSI(self.prices, period)
+            values = rsi.calculatePastIndicator()
+            self.assertEqual(len(values), len(self.prices) - period)
+            self.assertAlmostEqual(values[0], loopRSI(self.prices[:period + 1], period), places=9)
+            self.assertAlmostEqual(values[200], loopRSI(self.prices[:period + 201], period), places=9)
+            self.assertAlmostEqual(values[-1], rsi.currentValue, places=9)
+
+    def test_OverBoughtOverSold(self):
+        rsi = RSI(self.prices)
+        values = rsi.calculatePastIndicator()
+        np.testing.assert_array_equal(rsi.calculatePastOverBought(), values > 70)
+        np.testing.assert_array_equal(rsi.calculatePastOverSold(), values < 30)
+        self.assertEqual(rsi.calculatePastOverSold()[-1], rsi.overSold)
+
+    def test_NoLosses(self):
+        self.assertEqual(RSI(list(range(1, 30))).currentValue, 100.0)
+
+
+class Test_StreamingUpdates(unittest.TestCase):
+    def setUp(self):
+        rng = np.random.default_rng(11)
+        self.prices = list(100 + np.cumsum(rng.normal(size=600)))
+        self.history = self.prices[:300]
+        self.ticks = self.prices[300:]
+
+    def test_SimpleMovingAverage(self):
+        sma = SimpleMovingAverage(self.history, 20)
+        for i, price in enumerate(self.ticks):
+            value = sma.update(price)
+            self.assertAlmostEqual(value, sum(self.prices[301 + i - 20:301 + i]) / 20, places=9)
+        self.assertEqual(sma.currentValue, value)
+
+    def test_ExponentialMovingAverage(self):
+        ema = ExponentialMovingAverage(self.history, 12)
+        for price in self.ticks:
+            ema.update(price)
+        self.assertAlmostEqual(ema.currentValue, loopExponentialMovingAverage(self.prices, 12)[-1], places=9)
+
+    def test_RSI(self):
+        rsi = RSI(self.history, 14)
+        self.assertAlmostEqual(rsi.currentValue, loopRSI(self.history, 14), places=9)
+        for price in self.ticks:
+            rsi.update(price)
+        self.assertAlmostEqual(rsi.currentValue, loopRSI(self.prices, 14), places=9)
+
+    def test_MACD(self):
+        macd = MACD(self.history)
+        crossovers = 0
+        for price in self.ticks:
+            macd.update(price)
+            crossovers += abs(macd.crossover)
+
+        macdLine, signalLine, histogram = MACD(self.prices).calculatePastIndicator()
+        self.assertAlmostEqual(macd.currentValue, macdLine[-1], places=9)
+        self.assertAlmostEqual(macd.signal, signalLine[-1], places=9)
+        self.assertAlmostEqual(macd.histogram, histogram[-1], places=9)
+        self.assertEqual(crossovers, np.count_nonzero(np.diff(np.sign(histogram[299:]))))
+
+    def test_RSIPeriod(self):
+        self.assertAlmostEqual(RSI(self.history, 5).currentValue, loopRSI(self.history, 5), places=9)
+        self.assertRaises(ValueError, RSI, self.history[:14], 14)
+
+
+class Test_BatchIndicators(unittest.TestCase):
+    def setUp(self):
+        rng = np.random.default_rng(3)
+        self.prices = 100 + np.cumsum(rng.normal(size=(300, 3)), axis=0)
+        self.prices[:40, 1] = np.nan    # Shorter history
+        self.prices[150, 0] = np.nan    # Missing bar
+        self.prices[:, 2] = np.nan      # No history
+
+    def test_SimpleMovingAverage(self):
+        sma = batchSimpleMovingAverage(self.prices, 10)
+        self.assertEqual(sma.shape, self.prices.shape)
+        np.testing.assert_allclose(sma[49:, 1], loopSimpleMovingAverage(list(self.prices[40:, 1]), 10), rtol=1e-10)
+        self.assertTrue(np.isnan(sma[150:160, 0]).all())
+        self.assertFalse(np.isnan(sma[160:, 0]).any())
+        self.assertTrue(np.isnan(sma[:, 2]).all())
+
+    def test_ExponentialMovingAverage(self):
+        ema = batchExponentialMovingAverage(self.prices, 12)
+        np.testing.assert_allclose(ema[40:, 1], loopExponentialMovingAverage(list(self.prices[40:, 1]), 12), rtol=1e-12)
+        self.assertTrue(np.isnan(ema[:40, 1]).all())
+        self.assertTrue(np.isnan(ema[150, 0]))
+        self.assertTrue(np.isnan(ema[:, 2]).all())
+
+    def test_RSI(self):
+        rsi = batchRSI(self.prices, 14)
+        column = list(self.prices[40:, 1])
+        self.assertTrue(np.isnan(rsi[:54, 1]).all())
+        self.assertAlmostEqual(rsi[54, 1], loopRSI(column[:15], 14), places=9)
+        self.assertAlmostEqual(rsi[-1, 1], loopRSI(column, 14), places=9)
+        self.assertTrue(np.isnan(rsi[:, 2]).all())
+
+    def test_MACD(self):
+        macdLine, signalLine, histogram = batchMACD(self.prices)
+        column = list(self.prices[40:, 1])
+        expected = np.subtract(loopExponentialMovingAverage(column, 12), loopExponentialMovingAverage(column, 26))
+        np.testing.assert_allclose(macdLine[40:, 1], expected, atol=1e-9)
+        np.testing.assert_allclose(signalLine[40:, 1], loopExponentialMovingAverage(list(expected), 9), atol=1e-9)
+        np.testing.assert_allclose(histogram, macdLine - signalLine)
+
+    def test_SingleSymbol(self):
+        self.assertEqual(batchRSI(self.prices[:, 0]).shape, (300,))
+
+
+    def test_alignPrices(self):
+        prices = {
+            "MSFT": {"Date": np.array(["2021-01-04", "2021-01-05", "2021-01-06"], dtype="datetime64[D]"), "Close": np.array([1.0, 2.0, 3.0])},
+            "AAPL": {"Date": np.array(["2021-01-05", "2021-01-07"], dtype="datetime64[D]"), "Close": np.array([4.0, 5.0])},
+        }
+        dates, symbols, matrix = alignPrices(prices, "Close")
+        self.assertEqual(symbols, ["MSFT", "AAPL"])
+        np.testing.assert_array_equal(dates, np.array(["2021-01-04", "2021-01-05", "2021-01-06", "2021-01-07"], dtype="datetime64[D]"))
+        np.testing.assert_array_equal(matrix, [[1, np.nan], [2, 4], [3, np.nan], [np.nan, 5]])
+        self.assertEqual(batchSimpleMovingAverage(matrix, 2).shape, (4, 2))
+
+
+if __name__ == "__main__":
+    unittest.main()
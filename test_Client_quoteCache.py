@@ -0,0 +1,81 @@
+"""
+    Test file for testing the quoteCache module.
+
+"""
+import unittest
+import threading
+import time
+
+
+from Client.quoteCache import QuoteCache
+
+
+class Test_QuoteCache(unittest.TestCase):
+    def setUp(self):
+        self.cache = QuoteCache(ttl=60, maxSize=3)
+        self.requests = []
+
+    def fetch(self, tickerSymbols):
+        self.requests.append(tickerSymbols)
+        return {symbol: symbol.lower() for symbol in tickerSymbols if symbol != "NONE"}
+
+    def test_HitsAndMisses(self):
+        self.assertEqual(self.cache.getMany(["MSFT", "AAPL"], self.fetch), ["msft", "aapl"])
+        self.assertEqual(self.cache.getMany(["AAPL", "MSFT", "V"], self.fetch), ["aapl", "msft", "v"])
+        self.assertEqual(self.requests, [["MSFT", "AAPL"], ["V"]])
+        self.assertEqual(self.cache.stats, {"hits": 2, "misses": 3, "coalesced": 0, "size": 3})
+
+    def test_MissingQuote(self):
+        self.assertEqual(self.cache.getMany(["NONE", "MSFT"], self.fetch), [None, "msft"])
+        self.assertEqual(len(self.cache), 1)
+
+    def test_Expiry(self):
+        self.cache.ttl = 0.01
+        self.cache.getMany(["MSFT"], self.fetch)
+        time.sleep(0.02)
+        self.cache.getMany(["MSFT"], self.fetch)
+        self.assertEqual(self.requests, [["MSFT"], ["MSFT"]])
+
+    def test_LeastRecentlyUsedEviction(self):
+        self.cache.getMany(["A", "B", "C"], self.fetch)
+        self.cache.getMany(["A"], self.fetch)
+        self.cache.getMany(["D"], self.fetch)
+        self.cache.getMany(["A", "C", "D"], self.fetch)
+        self.cache.getMany(["B"], self.fetch)
+        self.assertEqual(self.requests, [["A", "B", "C"], ["D"], ["B"]])
+
+    def test_Coalescing(self):
+        started = threading.Event()
+        release = threading.Event()
+
+        def slowFetch(tickerSymbols):
+            started.set()
+            release.wait()
+            return self.fetch(tickerSymbols)
+
+        results = []
+        first = threading.Thread(target=lambda: results.append(self.cache.getMany(["MSFT"], slowFetch)))
+        first.start()
+        started.wait()
+        second = threading.Thread(target=lambda: results.append(self.cache.getMany(["MSFT"], self.fetch)))
+        second.start()
+        while self.cache.coalesced == 0:
+            time.sleep(0.001)
+        release.set()
+        first.join()
+        second.join()
+
+        self.assertEqual(results, [["msft"], ["msft"]])
+        self.assertEqual(self.requests, [["MSFT"]])
+        self.assertEqual(self.cache.coalesced, 1)
+
+    def test_FetchError(self):
+        def failingFetch(tickerSymbols):
+            raise ConnectionError("No connection")
+
+        self.assertRaises(ConnectionError, self.cache.getMany, ["MSFT"], failingFetch)
+        self.assertEqual(self.cache.getMany(["MSFT"], self.fetch), ["msft"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,100 @@
+"""
+    Test file for testing the quotePoller module.
+
+"""
+import unittest
+import time
+from types import SimpleNamespace
+import numpy as np
+
+
+from Client.quotePoller import TickRingBuffer, QuotePoller
+
+
+class FakeClient:
+    """ Returns a snapshot where every value is the number of the request. """
+    def __init__(self, delay: float = 0.0):
+        self.delay = delay
+        self.requests = 0
+
+    def getQuoteBatch(self, tickerSymbols, fresh=False):
+        if not fresh:
+            raise AssertionError("The poller must ask for fresh quotes.")
+        time.sleep(self.delay)
+        self.requests += 1
+        values = np.full(len(tickerSymbols), self.requests)
+        return SimpleNamespace(symbols=tickerSymbols, dateTimeUTC=values, bid=values, ask=values, lastTrade=values,
+                               bidSize=values, askSize=values, totalVolume=values)
+
+
+class Test_TickRingBuffer(unittest.TestCase):
+    def setUp(self):
+        self.buffer = TickRingBuffer(4)
+
+    def append(self, values):
+        for value in values:
+            self.buffer.append((value, value, value, value, value, value, value))
+
+    def test_BeforeFull(self):
+        self.append([1, 2])
+        self.assertEqual(len(self.buffer), 2)
+        np.testing.assert_array_equal(self.buffer.latest()["time"], [1, 2])
+
+    def test_Wrapped(self):
+        self.append(range(1, 11))
+        self.assertEqual(len(self.buffer), 4)
+        np.testing.assert_array_equal(self.buffer.latest()["bid"], [7, 8, 9, 10])
+        np.testing.assert_array_equal(self.buffer.latest(2)["totalVolume"], [9, 10])
+        np.testing.assert_array_equal(self.buffer.latest(10)["ask"], [7, 8, 9, 10])
+
+    def test_View(self):
+        self.append(range(1, 7))
+        self.assertIsNotNone(self.buffer.latest(3).base)
+
+    def test_ViewAfterAppend(self):
+        self.append(range(1, 7))
+        full, last = self.buffer.latest(), self.buffer.latest(2)
+        np.testing.assert_array_equal(full["time"], [3, 4, 5, 6])
+
+        # A view of n ticks stays intact for capacity - n appends.
+        self.append([7, 8])
+        np.testing.assert_array_equal(last["time"], [5, 6])
+        self.assertNotEqual(list(full["time"]), [3, 4, 5, 6])
+
+
+class Test_QuotePoller(unittest.TestCase):
+    def test_pollOnce(self):
+        poller = QuotePoller(FakeClient(), ["msft", "AAPL"], capacity=3)
+        for _ in range(5):
+            poller.pollOnce()
+        np.testing.assert_array_equal(poller.latest("MSFT")["lastTrade"], [3, 4, 5])
+        self.assertEqual(poller.metrics["polls"], 5)
+
+    def test_LatestIsCopy(self):
+        poller = QuotePoller(FakeClient(), ["MSFT"], capacity=3)
+        for _ in range(3):
+            poller.pollOnce()
+        ticks = poller.latest("MSFT")
+        poller.pollOnce()
+        np.testing.assert_array_equal(ticks["lastTrade"], [1, 2, 3])
+        np.testing.assert_array_equal(poller.latest("msft")["lastTrade"], [2, 3, 4])
+
+    def test_Schedule(self):
+        poller = QuotePoller(FakeClient(), ["MSFT"], interval=0.02)
+        poller.start()
+        time.sleep(0.21)
+        poller.stop()
+        self.assertTrue(9 <= poller.polls <= 12)
+        self.assertEqual(poller.missedPolls, 0)
+
+    def test_MissedPolls(self):
+        poller = QuotePoller(FakeClient(delay=0.05), ["MSFT"], interval=0.02)
+        poller.start()
+        time.sleep(0.2)
+        poller.stop()
+        self.assertGreater(poller.missedPolls, 0)
+        self.assertLessEqual(poller.polls, 5)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,77 @@
+"""
+    Test file for testing the tickLog module.
+
+"""
+import unittest
+import datetime
+import tempfile
+import shutil
+from types import SimpleNamespace
+import numpy as np
+
+
+from Client.tickLog import TickLogWriter, TickLogReader, tickLogPath, TICK_RECORD_DTYPE
+
+
+def snapshot(symbols, value):
+    values = np.full(len(symbols), value)
+    return SimpleNamespace(symbols=symbols, dateTimeUTC=values, bid=values, ask=values + 0.5, lastTrade=values,
+                           bidSize=values, askSize=values, totalVolume=values)
+
+
+class Test_TickLog(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        # 2022-08-17 13:30 UTC is 09:30 EDT.
+        self.marketOpen = datetime.datetime(2022, 8, 17, 13, 30, tzinfo=datetime.timezone.utc).timestamp()
+        with TickLogWriter(self.directory) as writer:
+            for i in range(10):
+                writer.write(snapshot(["MSFT", "AAPL"], i), self.marketOpen + (i * 60))
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_Read(self):
+        reader = TickLogReader(self.directory, datetime.date(2022, 8, 17))
+        self.assertEqual(len(reader), 20)
+        np.testing.assert_array_equal(reader.forSymbol("AAPL")["bid"], np.arange(10))
+        self.assertEqual(reader.symbols[reader.records["symbolId"][0]], "MSFT")
+
+    def test_Between(self):
+        reader = TickLogReader(self.directory, datetime.date(2022, 8, 17))
+        records = reader.between(self.marketOpen + 120, self.marketOpen + 300)
+        np.testing.assert_array_equal(reader.forSymbol("MSFT", records)["ask"], [2.5, 3.5, 4.5])
+
+    def test_Rotation(self):
+        # 02:00 UTC is still the evening of the 17th in New York.
+        evening = datetime.datetime(2022, 8, 18, 2, 0, tzinfo=datetime.timezone.utc).timestamp()
+        nextMorning = datetime.datetime(2022, 8, 18, 13, 30, tzinfo=datetime.timezone.utc).timestamp()
+        with TickLogWriter(self.directory) as writer:
+            writer.write(snapshot(["V"], 1), evening)
+            writer.write(snapshot(["V"], 2), nextMorning)
+
+        self.assertEqual(len(TickLogReader(self.directory, datetime.date(2022, 8, 17))), 21)
+        self.assertEqual(len(TickLogReader(self.directory, datetime.date(2022, 8, 18))), 1)
+
+    def test_PartialRecord(self):
+        with open(tickLogPath(self.directory, datetime.date(2022, 8, 17)), "ab") as fp:
+            fp.write(b"\0" * (TICK_RECORD_DTYPE.itemsize // 2))
+        self.assertEqual(len(TickLogReader(self.directory, datetime.date(2022, 8, 17))), 20)
+
+    def test_AppendAfterPartialRecord(self):
+        with open(tickLogPath(self.directory, datetime.date(2022, 8, 17)), "ab") as fp:
+            fp.write(b"\1" * 7)
+        with TickLogWriter(self.directory) as writer:
+            writer.write(snapshot(["MSFT"], 10), self.marketOpen + 600)
+
+        reader = TickLogReader(self.directory, datetime.date(2022, 8, 17))
+        self.assertEqual(len(reader), 21)
+        np.testing.assert_array_equal(reader.forSymbol("MSFT")["bid"], np.arange(11))
+        self.assertTrue((np.diff(reader.records["time"]) >= 0).all())
+
+    def test_MissingDay(self):
+        self.assertEqual(len(TickLogReader(self.directory, datetime.date(2022, 8, 19))), 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,136 @@
+"""
+    Test file for testing the tradingClient module.
+
+"""
+import unittest
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+
+
+from Client.tradingClient import EtradeClient, EtradeStockQuoteAll, QuoteBatch, timestampToEpochUTC, timestampsToEpochUTC
+from Client.quoteCache import QuoteCache
+from Client.quotePoller import QuotePoller
+
+
+def quoteResponse(symbol: str, bid: float, totalVolume: int) -> dict:
+    """ Returns a QuoteData item in the format of the E*TRADE quote response. """
+    values = {
+        "adjustedFlag": False, "ask": bid + 0.05, "askSize": 100, "askTime": "15:59:59 EDT 08-17-2022",
+        "bidExchange": "", "bid": bid, "bidSize": 200, "bidTime": "15:59:58 EDT 08-17-2022",
+        "changeClose": 1.25, "changeClosePercentage": 0.5, "companyName": symbol + " INC", "dirLast": "1",
+        "dividend": 0.62, "eps": 9.2, "estEarnings": 9.5, "exDividendDate": 1660708800, "high": bid + 1,
+        "low": bid - 1, "high52": bid + 50, "low52": bid - 50, "lastTrade": bid + 0.02, "open": bid - 0.5,
+        "previousClose": bid - 1.25, "previousDayVolume": 25000000, "primaryExchange": "NSDQ",
+        "totalVolume": totalVolume, "marketCap": 2.1e12, "sharesOutstanding": 7460000000,
+        "nextEarningDate": "", "beta": 0.93, "yield": 0.85, "declaredDividend": 0.62,
+        "dividendPayableDate": 1662984000, "pe": 31.2, "week52LowDate": 1657598400,
+        "week52HiDate": 1637038800, "intrinsicValue": 0.0, "timeOfLastTrade": 1660766399,
+        "averageVolume": 27000000
+    }
+    return {"Product": {"symbol": symbol, "securityType": "EQ"}, "dateTimeUTC": 1660766399,
+            "quoteStatus": "REALTIME", "ahFlag": False, "All": values}
+
+
+class Test_QuoteBatch(unittest.TestCase):
+    def setUp(self):
+        self.quotes = [EtradeStockQuoteAll(quoteResponse("MSFT", 290.0, 1000)),
+                       EtradeStockQuoteAll(quoteResponse("AAPL", 170.0, 2000))]
+        self.batch = QuoteBatch.fromQuotes(self.quotes)
+
+    def test_Slots(self):
+        self.assertFalse(hasattr(self.quotes[0], "__dict__"))
+
+    def test_Columns(self):
+        self.assertEqual(len(self.batch), 2)
+        np.testing.assert_array_equal(self.batch.bid, [290.0, 170.0])
+        np.testing.assert_allclose(self.batch.spread, [0.05, 0.05])
+        self.assertEqual(self.batch.totalVolume.dtype, np.int64)
+        self.assertRaises(AttributeError, getattr, self.batch, "companyName")
+
+    def test_Row(self):
+        self.assertEqual(self.batch.index("AAPL"), 1)
+        self.assertEqual(self.batch.row("AAPL")["totalVolume"], 2000)
+
+    def test_fromQuoteData(self):
+        batch = QuoteBatch.fromQuoteData([quoteResponse("MSFT", 290.0, 1000), quoteResponse("AAPL", 170.0, 2000)])
+        self.assertEqual(batch.symbols, self.batch.symbols)
+        for field in QuoteBatch.FIELDS:
+            np.testing.assert_array_equal(getattr(batch, field), getattr(self.batch, field))
+
+
+class Test_Timestamps(unittest.TestCase):
+    def test_DaylightTime(self):
+        self.assertEqual(timestampToEpochUTC("19:59:59 EDT 08-17-2022"), 1660780799.0)
+
+    def test_StandardTime(self):
+        self.assertEqual(timestampToEpochUTC("09:30:00 EST 01-03-2023"), 1672756200.0)
+
+    def test_UnknownTimezone(self):
+        self.assertRaises(NotImplementedError, timestampToEpochUTC, "09:30:00 PST 01-03-2023")
+        self.assertRaises(NotImplementedError, timestampsToEpochUTC, ["09:30:00 PST 01-03-2023"])
+
+    def test_Batch(self):
+        timestamps = ["19:59:59 EDT 08-17-2022", "09:30:00 EST 01-03-2023", "23:00:00 EST 12-31-1999"]
+        np.testing.assert_array_equal(timestampsToEpochUTC(timestamps), [timestampToEpochUTC(t) for t in timestamps])
+        self.assertEqual(timestampsToEpochUTC(["9:30:00 EST 01-03-2023"])[0], 1672756200.0)
+        self.assertEqual(len(timestampsToEpochUTC([])), 0)
+
+
+
+class StubEtradeClient(EtradeClient):
+    """ EtradeClient without a session, every quote request is answered locally and recorded. """
+    def __init__(self, quoteCacheTTL: float = 60.0):
+        self._quoteCache = QuoteCache(quoteCacheTTL)
+        self._quoteExecutor = ThreadPoolExecutor(max_workers=4)
+        self.requests = []
+        self._lock = threading.Lock()
+
+    def _getStockResponse(self, tickers):
+        with self._lock:
+            self.requests.append(list(tickers))
+            volume = len(self.requests)
+        return {"QuoteResponse": {"QuoteData": [quoteResponse(symbol, 100.0, volume) for symbol in tickers]}}
+
+
+class Test_EtradeClientQuotes(unittest.TestCase):
+    def test_Fresh(self):
+        client = StubEtradeClient()
+        client.getQuoteBatch(["MSFT"])
+        client.getQuoteBatch(["MSFT"])
+        self.assertEqual(len(client.requests), 1)
+
+        client.getQuoteBatch(["msft", "MSFT"], fresh=True)
+        self.assertEqual(client.requests[-1], ["MSFT"])
+        self.assertEqual(len(client.requests), 2)
+
+    def test_Chunks(self):
+        client = StubEtradeClient()
+        symbols = ["S%d" % i for i in range(60)]
+        quotes = client._fetchStockQuotes(symbols)
+        self.assertEqual(sorted(len(chunk) for chunk in client.requests), [10, 25, 25])
+        self.assertEqual(sorted(sum(client.requests, [])), sorted(symbols))
+        self.assertEqual(list(quotes), symbols)
+        self.assertEqual([quote.symbol for quote in client.getMultipleStockQuotes(symbols[::-1])], symbols[::-1])
+
+    def test_ConcurrentChunks(self):
+        client = StubEtradeClient()
+        # Only passes when the three chunks are requested at the same time.
+        barrier = threading.Barrier(3, timeout=5)
+        getStockResponse = client._getStockResponse
+        def waitingResponse(tickers):
+            barrier.wait()
+            return getStockResponse(tickers)
+
+        client._getStockResponse = waitingResponse
+        self.assertEqual(len(client._fetchStockQuotes(["S%d" % i for i in range(75)])), 75)
+
+    def test_PollerBypassesCache(self):
+        poller = QuotePoller(StubEtradeClient(), ["MSFT"])
+        for _ in range(3):
+            poller.pollOnce()
+        np.testing.assert_array_equal(poller.latest("MSFT")["totalVolume"], [1, 2, 3])
+
+
+if __name__ == "__main__":
+    unittest.main()